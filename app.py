@@ -1,6 +1,7 @@
 import os
+import json
 import logging
-from flask import Flask, jsonify, request, render_template
+from flask import Flask, Response, jsonify, request, render_template, stream_with_context
 from flask_cors import CORS
 from dotenv import load_dotenv
 
@@ -8,10 +9,19 @@ from src.config import Settings
 from src.utils.logging import setup_logging
 from src.rag.store import initialize_vector_store, clear_vector_store
 from src.rag.retrieval import build_retriever
+from src.rag.answer_cache import build_answer_cache
 
 # NEW: agent + chat history message types
 from langchain_core.messages import HumanMessage, AIMessage
-from src.agent.hr_agent import build_hr_agent
+from src.agent.hr_agent import (
+    build_hr_agent, build_routed_answerer, answer_or_fallback, retrieved_sources,
+)
+from src.agent.tools import format_fallback_answer
+from src.agent.resilience import get_llm_caller, request_deadline
+from src.agent.router import (
+    build_intent_router, cache_tag, ROUTE_TOOLS, SMALLTALK, OUT_OF_SCOPE, UNKNOWN,
+    SMALLTALK_ANSWER, OUT_OF_SCOPE_ANSWER,
+)
 
 load_dotenv()
 setup_logging()
@@ -31,13 +41,24 @@ retriever = build_retriever(vector_store, settings)
 
 # ---- hr_agent (tool-calling) -------------------------------------------------
 agent_executor = None
+routed_answerer = None
 try:
     agent_executor = build_hr_agent(retriever, settings)
+    routed_answerer = build_routed_answerer(retriever, settings)
     logger.info("hr_agent initialized")
 except Exception as e:
     logger.warning(f"hr_agent init failed (likely missing/invalid Groq API key): {e}")
     logger.info("Running in fallback mode - simple document retrieval will be used")
 
+# Shared LLM circuit breaker (open -> retrieval-only fallback answers)
+llm_breaker = get_llm_caller(settings).breaker
+
+# ---- Intent router (small-talk / hr / jisr / both / out-of-scope) ------------
+intent_router = build_intent_router(settings) if settings.ROUTER_ENABLED else None
+
+# ---- Semantic answer cache (first turns only) --------------------------------
+answer_cache = build_answer_cache(settings)
+
 # ---- In-memory session history (per session_id) ------------------------------
 _SESSIONS: dict[str, list] = {}
 
@@ -47,22 +68,50 @@ def _get_history(session_id: str) -> list:
         _SESSIONS[session_id] = []
     return _SESSIONS[session_id]
 
-# ---- Small-talk shortcut -----------------------------------------------------
-SMALLTALK_KEYWORDS = {
-    "hi", "hello", "hey", "hii", "good morning", "good evening", "good night",
-    "مرحبا", "السلام عليكم", "هلا", "هاي", "صباح الخير", "مساء الخير",
-    "كيف حالك", "شلونك", "كيفك", "اخبارك"
-}
+# ---- Canned replies -----------------------------------------------------------
+def _smalltalk_reply(msg: str) -> str:
+    return SMALLTALK_ANSWER
 
-def _is_smalltalk(msg: str) -> bool:
-    m = msg.strip().lower()
-    for kw in SMALLTALK_KEYWORDS:
-        if kw in m:
-            return True
-    return False
+def _out_of_scope_reply(msg: str) -> str:
+    return OUT_OF_SCOPE_ANSWER
 
-def _smalltalk_reply(msg: str) -> str:
-    return "مرحبًا! كيف أقدر أساعدك اليوم؟ 😊"
+# ---- Retrieval-only fallback ---------------------------------------------------
+def _fallback_answer(msg: str, top_k: int) -> dict:
+    """Answer from the top retrieved chunks without any LLM call."""
+    return format_fallback_answer(retriever.get_relevant_documents(msg, k=top_k))
+
+# ---- Request validation ------------------------------------------------------
+_MAX_TOP_K = 50
+
+def _int_param(payload: dict, name: str, default: int, lo: int, hi: int | None) -> int:
+    """Integer field from a JSON body, or ValueError with a client-facing message."""
+    value = payload.get(name, default)
+    if isinstance(value, bool) or not isinstance(value, (int, str)):
+        raise ValueError(f"{name} must be an integer")
+    try:
+        value = int(value)
+    except ValueError:
+        raise ValueError(f"{name} must be an integer") from None
+    if value < lo or (hi is not None and value > hi):
+        raise ValueError(f"{name} must be between {lo} and {hi}" if hi is not None else f"{name} must be >= {lo}")
+    return value
+
+def _questions_param(payload: dict, max_questions: int) -> list:
+    """
+    Non-empty list of non-blank strings, or ValueError with a client-facing
+    message. Nothing is dropped: output "index" is the client's list position.
+    """
+    raw = payload.get("questions")
+    if not isinstance(raw, list) or not all(isinstance(q, str) for q in raw):
+        raise ValueError("questions must be a list of strings")
+    if not raw:
+        raise ValueError("questions must be a non-empty list")
+    if len(raw) > max_questions:
+        raise ValueError(f"at most {max_questions} questions per batch")
+    blank = [i for i, q in enumerate(raw) if not q.strip()]
+    if blank:
+        raise ValueError(f"questions must not be blank (indices {blank[:10]})")
+    return [q.strip() for q in raw]
 
 # ---- Routes ------------------------------------------------------------------
 @app.get("/")
@@ -71,12 +120,19 @@ def home():
 
 @app.get("/health")
 def health():
-    return jsonify({"status": "ok"})
+    from src.rag.embeddings import get_embeddings
+    embeddings = get_embeddings(settings)
+    body = {"status": "ok", "llm_breaker": llm_breaker.snapshot()}
+    if hasattr(embeddings, "stats"):
+        body["embed_batcher"] = embeddings.stats()  # batch sizes + queueing delay
+    return jsonify(body)
 
 @app.post("/reset")
 def reset_store():
     """Clear Chroma collection and filesystem directory safely."""
     ok = clear_vector_store(settings)
+    if answer_cache is not None:
+        answer_cache.clear()
     return jsonify({"ok": ok})
 
 @app.post("/ingest")
@@ -85,6 +141,9 @@ def ingest():
     payload = request.get_json(silent=True) or {}
     source = payload.get("source", "all")  # "all" | "policies" | "jisr"
     stats = run_ingestion(settings, source)
+    if answer_cache is not None:
+        answer_cache.invalidate_sources(stats.get("sources", []))
+        answer_cache.prune_missing()
     return jsonify({"ok": True, "stats": stats})
 
 @app.post("/chat")
@@ -97,67 +156,109 @@ def chat():
     if not msg:
         return jsonify({"answer": "يرجى كتابة سؤالك.", "citations": []})
 
-    # 👉 Small-talk fast path
-    if _is_smalltalk(msg):
-        return jsonify({"answer": _smalltalk_reply(msg), "citations": []})
+    # 👉 Local intent routing (no LLM call). First turns only: a follow-up
+    # ("شكرا، وماذا عن المدراء؟") needs the agent and the history, not a canned reply.
+    history = _get_history(session_id)
+    decision = intent_router.route(msg) if intent_router is not None and not history else None
+    if decision is not None:
+        logger.info(f"[{session_id}] route={decision.label} ({decision.method}, {decision.confidence:.2f})")
+        if decision.label == SMALLTALK:
+            return jsonify({"answer": _smalltalk_reply(msg), "citations": []})
+        if decision.label == OUT_OF_SCOPE:
+            return jsonify({"answer": _out_of_scope_reply(msg), "citations": []})
 
     try:
         logger.info(f"[{session_id}] user: {msg[:120]}")
 
         # Prefer agent path
         if agent_executor is not None:
-            history = _get_history(session_id)
-
-            result = agent_executor.invoke({
-                "input": msg,
-                "chat_history": history,  # list[BaseMessage]
-            })
-            output = result.get("output", "")
-
-            # Extract structured citations from the model's tagged JSON block
-            import re, json as _json
-            citations = []
-            m = re.search(r"<citations>(.*?)</citations>", output, flags=re.S)
-            if m:
-                try:
-                    citations = _json.loads(m.group(1)).get("items", [])
-                    output = output.replace(m.group(0), "").strip()
-                except Exception:
-                    pass
+            # History-independent first turn -> eligible for the answer cache
+            cacheable = answer_cache is not None and not history and top_k == settings.DEFAULT_TOP_K
+            if cacheable:
+                # Near-identical wording is not enough: route + domain keywords must match too
+                tag = cache_tag(msg, decision.label if decision is not None else UNKNOWN)
+                hit = answer_cache.lookup(msg, tag=tag)
+                if hit is not None:
+                    logger.info(f"[{session_id}] answer cache hit")
+                    history.append(HumanMessage(content=msg))
+                    history.append(AIMessage(content=hit["answer"]))
+                    return jsonify({"answer": hit["answer"], "citations": hit["citations"], "cached": True})
+
+            # Route already known (first turns only, see above): skip the LLM
+            # tool-choice round trip.
+            routed = decision is not None and decision.label in ROUTE_TOOLS
+            if routed_answerer is not None and routed:
+                runner = routed_answerer
+                inputs = {"input": msg, "chat_history": history, "route": decision.label}
+            else:
+                runner = agent_executor
+                inputs = {"input": msg, "chat_history": history}  # list[BaseMessage]
+
+            # One LLM budget for the whole turn (the agent makes several calls)
+            with request_deadline(settings.LLM_REQUEST_DEADLINE_S):
+                answer, result = answer_or_fallback(
+                    runner, inputs, llm_breaker, lambda: _fallback_answer(msg, top_k)
+                )
+            if result is None:
+                return jsonify(answer)
+            output, citations = answer["answer"], answer["citations"]
 
             # Save to history
             history.append(HumanMessage(content=msg))
             history.append(AIMessage(content=output))
 
+            # Only cache answers we can invalidate later: keyed on every source
+            # retrieved for this answer, not just what the model cited
+            sources = retrieved_sources(result)
+            if cacheable and sources:
+                answer_cache.store(msg, output, citations, sources=sources, tag=tag)
+
             return jsonify({"answer": output, "citations": citations})
 
         # ---- Fallback: simple retrieval only --------------------------------
         logger.info("Agent unavailable; using simple retriever fallback")
-        docs = retriever.get_relevant_documents(msg, k=top_k)
-        if docs:
-            chunks = []
-            for d in docs[:3]:
-                title = d.metadata.get("doc_title", "غير معروف")
-                chunk_idx = d.metadata.get("chunk", 0)
-                text = (d.page_content or "")[:400]
-                chunks.append(f"- [{title} :: #{chunk_idx}]\n{text}")
-            answer = "ملخص من المصادر (الوضع الاحتياطي):\n\n" + "\n\n".join(chunks)
-            citations = [{
-                "doc_title": d.metadata.get("doc_title", "unknown"),
-                "chunk": d.metadata.get("chunk", 0),
-                "source": d.metadata.get("source", ""),
-                "corpus": d.metadata.get("corpus", ""),
-            } for d in docs]
-        else:
-            answer = "لا توجد مصادر كافية للإجابة حالياً."
-            citations = []
-
-        return jsonify({"answer": answer, "citations": citations})
+        return jsonify(_fallback_answer(msg, top_k))
 
     except Exception as e:
         logger.exception("Error handling /chat")
         return jsonify({"error": str(e)}), 500
 
+@app.post("/chat/batch")
+def chat_batch():
+    """
+    Answer many questions at once. Body: {"questions": [...], "top_k"?, "concurrency"?}.
+    Streams JSONL: one line per question (completion order), then a summary line.
+    """
+    from src.agent.batch import answer_batch
+    from src.rag.embeddings import get_embeddings
+
+    payload = request.get_json(force=True) or {}
+    try:
+        questions = _questions_param(payload, settings.BATCH_MAX_QUESTIONS)
+        top_k = _int_param(payload, "top_k", settings.DEFAULT_TOP_K, 1, _MAX_TOP_K)
+        concurrency = _int_param(payload, "concurrency", settings.BATCH_CONCURRENCY, 1, None)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    concurrency = min(concurrency, settings.BATCH_MAX_CONCURRENCY)
+
+    items = answer_batch(
+        questions,
+        vector_store=vector_store,
+        embeddings=get_embeddings(settings),
+        doc_store=getattr(retriever, "doc_store", None),  # set when HIERARCHICAL_RETRIEVAL
+        settings=settings,
+        router=intent_router,
+        answerer=routed_answerer if not llm_breaker.is_open() else None,
+        top_k=top_k,
+        concurrency=concurrency,
+    )
+
+    def generate():
+        for item in items:
+            yield json.dumps(item, ensure_ascii=False) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
 # ---- Main --------------------------------------------------------------------
 if __name__ == "__main__":
     host = os.getenv("HOST", "0.0.0.0")
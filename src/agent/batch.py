@@ -0,0 +1,148 @@
+# src/agent/batch.py
+"""
+Bulk question answering: one batched embedding call for all questions, one
+search per corpus (document selection for all questions at once when a
+document index is given), then LLM calls fanned out with a concurrency limit.
+Results are yielded as they complete (one dict per question, then a summary).
+"""
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Dict, Iterator, List, Optional
+
+from src.agent.hr_agent import extract_citations
+from src.agent.resilience import LLMUnavailable, request_deadline
+from src.agent.router import (
+    BOTH, OUT_OF_SCOPE, OUT_OF_SCOPE_ANSWER, ROUTE_TOOLS, SMALLTALK, SMALLTALK_ANSWER, UNKNOWN,
+)
+from src.agent.tools import TOOL_CORPUS, format_fallback_answer
+from src.rag.embeddings import embed_queries
+from src.rag.retrieval import batch_hierarchical_search, batch_mmr_search, mmr_fetch_k
+
+logger = logging.getLogger(__name__)
+
+
+def _ms(seconds: float) -> float:
+    return round(seconds * 1000, 1)
+
+
+def answer_batch(
+    questions: List[str],
+    *,
+    vector_store: Any,
+    embeddings: Any,
+    doc_store: Optional[Any] = None,
+    settings: Any,
+    router: Optional[Any] = None,
+    answerer: Optional[Any] = None,
+    top_k: Optional[int] = None,
+    concurrency: Optional[int] = None,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Yield {"index", "question", "route", "answer", "citations", "timing_ms"}
+    per question in completion order, then {"summary": {...}}.
+    Without an answerer (no LLM) every item gets the retrieval-only answer.
+    With a `doc_store` retrieval is two-level, as in HierarchicalRetriever.
+    """
+    t_start = time.perf_counter()
+    k = int(top_k or settings.DEFAULT_TOP_K)
+    workers = min(max(1, int(concurrency or settings.BATCH_CONCURRENCY)), settings.BATCH_MAX_CONCURRENCY)
+
+    # 1) One batched forward pass for every query
+    t0 = time.perf_counter()
+    vecs = embed_queries(embeddings, questions) if questions else []
+    embed_s = time.perf_counter() - t0
+
+    # 2) Route locally (reusing the vectors), unknown -> search both corpora
+    routes: List[str] = []
+    for q, v in zip(questions, vecs):
+        label = router.route(q, query_vec=v).label if router is not None else UNKNOWN
+        routes.append(BOTH if label == UNKNOWN else label)
+
+    # 3) One bulk search per corpus
+    t0 = time.perf_counter()
+    docs_by_tool: List[Dict[str, list]] = [{} for _ in questions]
+    for tool_name, corpus in TOOL_CORPUS.items():
+        idxs = [i for i, r in enumerate(routes) if tool_name in ROUTE_TOOLS.get(r, [])]
+        if not idxs:
+            continue
+        search_kwargs = dict(
+            k=k, fetch_k=mmr_fetch_k(k, settings), lambda_mult=settings.MMR_LAMBDA, filter={"corpus": corpus},
+        )
+        if doc_store is not None:
+            results = batch_hierarchical_search(
+                vector_store, doc_store, [vecs[i] for i in idxs], top_docs=settings.HIER_TOP_DOCS, **search_kwargs,
+            )
+        else:
+            results = batch_mmr_search(vector_store, [vecs[i] for i in idxs], **search_kwargs)
+        for i, docs in zip(idxs, results):
+            docs_by_tool[i][tool_name] = docs
+    search_s = time.perf_counter() - t0
+    t_retrieved = time.perf_counter()
+
+    def work(i: int) -> Dict[str, Any]:
+        t_begin = time.perf_counter()
+        q, route = questions[i], routes[i]
+        item: Dict[str, Any] = {"index": i, "question": q, "route": route}
+
+        if route == SMALLTALK:
+            item.update(answer=SMALLTALK_ANSWER, citations=[])
+        elif route == OUT_OF_SCOPE:
+            item.update(answer=OUT_OF_SCOPE_ANSWER, citations=[])
+        else:
+            all_docs = [d for docs in docs_by_tool[i].values() for d in docs]
+            try:
+                if answerer is None:
+                    item.update(format_fallback_answer(all_docs), fallback=True)
+                    return _timed(item, t_begin)
+                with request_deadline(settings.LLM_REQUEST_DEADLINE_S):
+                    result = answerer.invoke({
+                        "input": q,
+                        "chat_history": [],
+                        "route": route,
+                        "docs_by_tool": docs_by_tool[i],
+                    })
+                answer, citations = extract_citations(result.get("output", ""))
+                item.update(answer=answer, citations=citations)
+            except LLMUnavailable as e:
+                item.update(format_fallback_answer(all_docs), fallback=True)
+                item["error"] = str(e)
+            except Exception as e:
+                logger.exception(f"Batch item {i} failed")
+                item.update(answer="", citations=[], error=str(e))
+
+        return _timed(item, t_begin)
+
+    def _timed(item: Dict[str, Any], t_begin: float) -> Dict[str, Any]:
+        t_end = time.perf_counter()
+        item["timing_ms"] = {
+            "queue": _ms(t_begin - t_retrieved),
+            "llm": _ms(t_end - t_begin),
+            "total": _ms(t_end - t_start),
+        }
+        return item
+
+    n_errors = 0
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="batch")
+    try:
+        futures = [pool.submit(work, i) for i in range(len(questions))]
+        for f in as_completed(futures):
+            item = f.result()
+            n_errors += 1 if item.get("error") else 0
+            yield item
+    except GeneratorExit:
+        # Consumer went away (client disconnected): drop the questions not started yet
+        pool.shutdown(wait=False, cancel_futures=True)
+        logger.info("Batch abandoned by consumer; pending questions cancelled")
+        raise
+    finally:
+        pool.shutdown(wait=True)
+
+    yield {"summary": {
+        "questions": len(questions),
+        "errors": n_errors,
+        "concurrency": workers,
+        "embed_ms": _ms(embed_s),
+        "search_ms": _ms(search_s),
+        "total_ms": _ms(time.perf_counter() - t_start),
+    }}
@@ -1,13 +1,18 @@
 # src/agent/hr_agent.py
 import os
+import re
+import json
 import logging
-from typing import Any
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 from langchain_groq import ChatGroq
+from pydantic import PrivateAttr
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain.agents import create_tool_calling_agent, AgentExecutor
 
-from src.agent.tools import build_tools
+from src.agent.tools import build_tools, _pack
+from src.agent.router import ROUTE_TOOLS
+from src.agent.resilience import LLMUnavailable, get_llm_caller
 
 logger = logging.getLogger(__name__)
 
@@ -40,7 +45,46 @@ AGENT_SYSTEM = """أنت hr_agent.
 
 AGENT_HUMAN = "{input}"
 
-def _build_llm() -> ChatGroq:
+# Used when the intent router already picked the source(s): the tools are run
+# directly and the LLM is called once to compose the answer.
+ROUTED_SYSTEM = """أنت hr_agent.
+
+تم تحديد مصدر البحث مسبقاً ({route}) وتم تشغيل أدوات البحث، ونتائجها أدناه.
+
+قواعد صارمة:
+1) اعتمد فقط على "context" في نتائج الأدوات. لا تُخمن ولا تضف معلومات خارج المصادر.
+2) إذا لم تجد معلومة كافية في السياق، صرّح بذلك بوضوح واقترح على المستخدم تحديد سؤاله أو رفع ملف السياسة المناسب.
+3) صُغ الإجابة بالعربية بشكل موجز وواضح وعملي.
+4) اختم بقسم "المراجع" يذكر اسم المستند + رقم الجزء (chunk) لكل مصدر استندت إليه.
+5) في السطر الأخير، ضع بلوك JSON داخل الوسمين التاليين حرفيًا:
+<citations>{{"items":[...]}}</citations>
+- "items" يجب أن تكون مصفوفة الدمج (بدون تكرار) لكل "citations" في نتائج الأدوات بالشكل:
+  {{"doc_title": "string", "chunk": 0, "source": "string", "corpus": "hr"|"jisr"}}
+- لا تضف مفاتيح أخرى غير المذكورة.
+- لا تغيّر أسماء المفاتيح.
+
+نتائج الأدوات:
+{tool_results}
+"""
+
+class _ResilientChatGroq(ChatGroq):
+    """
+    ChatGroq whose every completion goes through the shared ResilientCaller.
+    Built with disable_streaming=True: AgentExecutor streams by default, and
+    _stream would bypass _generate (and with it deadlines, retries and the
+    breaker).
+    """
+
+    _caller: Any = PrivateAttr(default=None)
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        if self._caller is None:
+            return super()._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+        return self._caller.call(
+            lambda: ChatGroq._generate(self, messages, stop=stop, run_manager=run_manager, **kwargs)
+        )
+
+def _build_llm(settings: Any) -> ChatGroq:
     """Build the Groq LLM client locked to openai/gpt-oss-120b."""
     api_key = os.getenv("GROQ_API_KEY", "")
     if not api_key:
@@ -52,8 +96,27 @@ def _build_llm() -> ChatGroq:
     except Exception:
         temperature = 0.2
 
+    # Optional override, e.g. a local stand-in server for load tests
+    # (see tools/loadtest/stub_llm.py). Unset = Groq's public endpoint.
+    extra = {}
+    base_url = os.getenv("GROQ_BASE_URL", "")
+    if base_url:
+        extra["base_url"] = base_url
+
     logger.info(f"Starting hr_agent with model: {model}, temperature={temperature}")
-    return ChatGroq(model_name=model, temperature=temperature, groq_api_key=api_key)
+    # Retries/deadlines are handled by ResilientCaller, so the SDK doesn't retry
+    # on its own; its HTTP timeout matches the per-attempt deadline.
+    llm = _ResilientChatGroq(
+        model_name=model,
+        temperature=temperature,
+        groq_api_key=api_key,
+        timeout=settings.LLM_TIMEOUT_S,
+        max_retries=0,
+        disable_streaming=True,  # stream() -> invoke() -> _generate
+        **extra,
+    )
+    llm._caller = get_llm_caller(settings)
+    return llm
 
 def build_hr_agent(retriever: Any, settings: Any) -> AgentExecutor:
     """
@@ -61,7 +124,7 @@ def build_hr_agent(retriever: Any, settings: Any) -> AgentExecutor:
     then compose a final Arabic answer with citations.
     """
     tools = build_tools(retriever, settings.DEFAULT_TOP_K)
-    llm = _build_llm()
+    llm = _build_llm(settings)
 
     prompt = ChatPromptTemplate.from_messages([
         ("system", AGENT_SYSTEM),
@@ -79,6 +142,101 @@ def build_hr_agent(retriever: Any, settings: Any) -> AgentExecutor:
         handle_parsing_errors=True,
         max_iterations=4,
         early_stopping_method="force",   # ✅ FIXED (was "generate")
-        return_intermediate_steps=False
+        return_intermediate_steps=True,  # tool outputs -> retrieved_sources()
     )
     return executor
+
+
+_CITATIONS_RE = re.compile(r"<citations>(.*?)</citations>", flags=re.S)
+
+def extract_citations(output: str) -> Tuple[str, List[Dict[str, Any]]]:
+    """Split the model's tagged <citations> JSON block off the answer text."""
+    citations: List[Dict[str, Any]] = []
+    m = _CITATIONS_RE.search(output or "")
+    if m:
+        try:
+            citations = json.loads(m.group(1)).get("items", [])
+            output = output.replace(m.group(0), "").strip()
+        except Exception:
+            pass
+    return output, citations
+
+def retrieved_sources(result: dict) -> List[str]:
+    """
+    Sources of every document the search tools returned during one invoke()
+    (AgentExecutor or RoutedAnswerer result), whether or not the model cited it.
+    """
+    sources = set()
+    for _, observation in result.get("intermediate_steps") or []:
+        try:
+            payload = json.loads(observation)
+        except Exception:
+            continue
+        sources.update(str(c["source"]) for c in payload.get("citations", []) if c.get("source"))
+    return sorted(sources)
+
+def answer_or_fallback(
+    runner: Any, inputs: dict, breaker: Any, fallback: Callable[[], Dict[str, Any]]
+) -> Tuple[Dict[str, Any], Optional[dict]]:
+    """
+    Run the agent / routed answerer and return ({"answer", "citations"}, raw result).
+    When the LLM fails for any reason (breaker open, retries or deadline
+    exhausted, request rejected) return (fallback(), None) instead, e.g. the
+    retrieval-only answer.
+    """
+    if breaker.is_open():
+        logger.warning("LLM circuit breaker open; serving retrieval-only fallback")
+        return fallback(), None
+    try:
+        result = runner.invoke(inputs)
+    except LLMUnavailable as e:
+        logger.warning(f"LLM unavailable ({e}); serving retrieval-only fallback")
+        return fallback(), None
+    answer, citations = extract_citations(result.get("output", ""))
+    return {"answer": answer, "citations": citations}, result
+
+class RoutedAnswerer:
+    """
+    Answer a question whose route (hr / jisr / both) is already known:
+    run the matching search tools directly, then make a single LLM call.
+    Mirrors AgentExecutor.invoke's input/output shape ("output" plus
+    "intermediate_steps" as (tool name, tool output) pairs). Callers that already
+    retrieved (e.g. batch answering) pass {"docs_by_tool": {name: [Document]}}
+    to skip the tool calls.
+    """
+
+    def __init__(self, tools: list, llm: ChatGroq):
+        self._tools = {t.name: t for t in tools}
+        prompt = ChatPromptTemplate.from_messages([
+            ("system", ROUTED_SYSTEM),
+            MessagesPlaceholder("chat_history"),
+            ("human", AGENT_HUMAN),
+        ])
+        self._chain = prompt | llm
+
+    def invoke(self, inputs: dict) -> dict:
+        route = inputs["route"]
+        query = inputs["input"]
+        docs_by_tool = inputs.get("docs_by_tool")
+        blocks = []
+        steps = []
+        for name in ROUTE_TOOLS[route]:
+            if docs_by_tool is not None:
+                result = _pack(docs_by_tool.get(name, []))
+            else:
+                result = self._tools[name].invoke({"query": query})
+            blocks.append(f"{name}:\n{result}")
+            steps.append((name, result))
+
+        msg = self._chain.invoke({
+            "route": route,
+            "tool_results": "\n\n".join(blocks),
+            "input": query,
+            "chat_history": inputs.get("chat_history", []),
+        })
+        return {"output": msg.content, "intermediate_steps": steps}
+
+def build_routed_answerer(retriever: Any, settings: Any) -> RoutedAnswerer:
+    """Build the single-call answerer used when the intent router is confident."""
+    tools = build_tools(retriever, settings.DEFAULT_TOP_K)
+    return RoutedAnswerer(tools, _build_llm(settings))
@@ -0,0 +1,290 @@
+# src/agent/resilience.py
+"""
+Resilience for LLM calls: per-attempt deadlines, bounded retries with full
+jitter, optional hedged requests, and a process-wide circuit breaker.
+
+When the breaker is open, calls fail fast with CircuitOpenError so /chat can
+serve the retrieval-only fallback answer. After LLM_BREAKER_RESET_S the
+breaker goes half-open and lets a single live request through as a probe;
+success closes it again, failure re-opens it. Every provider error surfaces as
+LLMUnavailable (so callers can always fall back); a 4xx rejection of the
+request itself is not retried and leaves the failure count unchanged.
+
+LLM_DEADLINE_S bounds one LLM call (all its retries); an agent turn makes
+several calls, so /chat also sets a request-level deadline (request_deadline)
+and every call gets min(its own budget, what is left of the request's).
+"""
+import contextvars
+import logging
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+# Absolute time.monotonic() deadline of the request being served, if any
+_request_deadline: "contextvars.ContextVar[Optional[float]]" = contextvars.ContextVar(
+    "llm_request_deadline", default=None
+)
+
+
+@contextmanager
+def request_deadline(seconds: float) -> Iterator[None]:
+    """Cap every LLM call made inside the block (same thread/context) to `seconds` in total."""
+    token = _request_deadline.set(time.monotonic() + seconds)
+    try:
+        yield
+    finally:
+        _request_deadline.reset(token)
+
+
+class LLMUnavailable(RuntimeError):
+    """The LLM could not produce a result within the retry/deadline budget."""
+
+
+class CircuitOpenError(LLMUnavailable):
+    """Raised without calling the provider because the breaker is open."""
+
+
+class LLMRequestRejected(LLMUnavailable):
+    """The provider rejected this request (4xx, e.g. Groq's tool_use_failed); not retried."""
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker: closed -> open -> half_open -> closed."""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._maybe_half_open()
+            return self._state
+
+    def _maybe_half_open(self) -> None:
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self._state = self.HALF_OPEN
+            self._probe_in_flight = False
+            logger.info("LLM circuit breaker half-open; next call probes the provider")
+
+    def is_open(self) -> bool:
+        """True when a call right now would be rejected."""
+        with self._lock:
+            self._maybe_half_open()
+            return self._state == self.OPEN or (self._state == self.HALF_OPEN and self._probe_in_flight)
+
+    def allow(self) -> bool:
+        """Reserve permission for one call (the single probe when half-open)."""
+        with self._lock:
+            self._maybe_half_open()
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            return False
+
+    def release(self) -> None:
+        """End a call that says nothing about provider health (frees the half-open probe)."""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self._state != self.CLOSED:
+                logger.info("LLM circuit breaker closed (provider recovered)")
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    logger.warning(f"LLM circuit breaker OPEN after {self._failures} consecutive failures")
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._probe_in_flight = False
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            self._maybe_half_open()
+            return {"state": self._state, "consecutive_failures": self._failures}
+
+
+def _status(exc: BaseException) -> Optional[int]:
+    status = getattr(exc, "status_code", None)
+    if status is None:
+        status = getattr(getattr(exc, "response", None), "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def _is_transient(exc: BaseException) -> bool:
+    """Timeouts, connection errors, 408/409/429 and 5xx are worth retrying."""
+    if isinstance(exc, TimeoutError):
+        return True
+    status = _status(exc)
+    if status is not None:
+        return status in (408, 409, 429) or status >= 500
+    name = type(exc).__name__
+    return "Timeout" in name or "Connection" in name
+
+
+def _is_client_error(exc: BaseException) -> bool:
+    """A 4xx the provider answered for this request only (bad prompt / tool call, auth...)."""
+    status = _status(exc)
+    return status is not None and 400 <= status < 500 and not _is_transient(exc)
+
+
+class ResilientCaller:
+    """
+    Run a blocking call under deadline / retry / hedge / breaker policy.
+
+    Attempts run on a shared pool so they can be abandoned at their deadline,
+    but an abandoned attempt keeps its worker until the HTTP client's own
+    timeout (LLM_TIMEOUT_S) fires. One call can therefore pin up to
+    (max_retries + 1) * (2 if hedging else 1) workers; size `max_workers`
+    (LLM_POOL_SIZE) for peak concurrent calls times that. When the pool is
+    exhausted, new attempts queue and their queueing time counts against
+    their timeout.
+    """
+
+    def __init__(
+        self,
+        breaker: CircuitBreaker,
+        attempt_timeout: float = 20.0,
+        deadline: float = 45.0,
+        max_retries: int = 2,
+        backoff_base: float = 0.5,
+        backoff_max: float = 4.0,
+        hedge_after: float = 0.0,
+        max_workers: int = 64,
+    ):
+        self.breaker = breaker
+        self.attempt_timeout = attempt_timeout
+        self.deadline = deadline
+        self.max_retries = max(0, int(max_retries))
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hedge_after = hedge_after
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="llm")
+
+    def _submit(self, fn: Callable[[], T]):
+        # Copy contextvars so tracing/callbacks follow the call into the pool
+        ctx = contextvars.copy_context()
+        return self._pool.submit(ctx.run, fn)
+
+    def _attempt(self, fn: Callable[[], T], timeout: float) -> T:
+        start = time.monotonic()
+        futures = [self._submit(fn)]
+
+        if 0 < self.hedge_after < timeout:
+            done, _ = wait(futures, timeout=self.hedge_after)
+            if not done:
+                logger.info(f"LLM call slower than {self.hedge_after:.2f}s; sending hedged request")
+                futures.append(self._submit(fn))
+
+        last_exc: Optional[BaseException] = None
+        pending = set(futures)
+        while pending:
+            remaining = timeout - (time.monotonic() - start)
+            if remaining <= 0:
+                break
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            for f in done:
+                exc = f.exception()
+                if exc is None:
+                    for p in pending:
+                        p.cancel()
+                    return f.result()
+                last_exc = exc
+        if pending:
+            raise TimeoutError(f"LLM call exceeded {timeout:.1f}s")
+        raise last_exc  # type: ignore[misc]
+
+    def _remaining(self, start: float) -> float:
+        """Seconds left for this call: its own deadline and the request's, whichever is sooner."""
+        left = self.deadline - (time.monotonic() - start)
+        req = _request_deadline.get()
+        if req is not None:
+            left = min(left, req - time.monotonic())
+        return left
+
+    def call(self, fn: Callable[[], T]) -> T:
+        start = time.monotonic()
+        last_exc: Optional[BaseException] = None
+
+        for attempt in range(self.max_retries + 1):
+            remaining = self._remaining(start)
+            if remaining <= 0:
+                break
+            if not self.breaker.allow():
+                raise CircuitOpenError("LLM circuit breaker is open")
+
+            try:
+                result = self._attempt(fn, min(self.attempt_timeout, remaining))
+            except Exception as e:
+                if _is_client_error(e):
+                    # Request-level problem: retrying won't help, and it says
+                    # nothing about provider health (the count stays as is)
+                    self.breaker.release()
+                    raise LLMRequestRejected(f"LLM request rejected: {e}") from e
+                self.breaker.record_failure()
+                if not _is_transient(e):
+                    raise LLMUnavailable(f"LLM call failed: {e}") from e
+                last_exc = e
+                logger.warning(f"LLM attempt {attempt + 1}/{self.max_retries + 1} failed: {e}")
+            else:
+                self.breaker.record_success()
+                return result
+
+            if attempt < self.max_retries:
+                # Full jitter, never sleeping past the overall deadline
+                backoff = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+                time.sleep(max(0.0, min(backoff, self._remaining(start))))
+
+        if last_exc is None:
+            raise LLMUnavailable("LLM request deadline exhausted")
+        raise LLMUnavailable(f"LLM unavailable after retries: {last_exc}") from last_exc
+
+
+_llm_breaker: Optional[CircuitBreaker] = None
+_llm_caller: Optional[ResilientCaller] = None
+_init_lock = threading.Lock()
+
+
+def get_llm_caller(settings: Any) -> ResilientCaller:
+    """Process-wide caller so every LLM client shares one circuit breaker."""
+    global _llm_breaker, _llm_caller
+    with _init_lock:
+        if _llm_caller is None:
+            _llm_breaker = CircuitBreaker(settings.LLM_BREAKER_FAILURES, settings.LLM_BREAKER_RESET_S)
+            _llm_caller = ResilientCaller(
+                _llm_breaker,
+                attempt_timeout=settings.LLM_TIMEOUT_S,
+                deadline=settings.LLM_DEADLINE_S,
+                max_retries=settings.LLM_MAX_RETRIES,
+                backoff_base=settings.LLM_BACKOFF_BASE_S,
+                backoff_max=settings.LLM_BACKOFF_MAX_S,
+                hedge_after=settings.LLM_HEDGE_AFTER_S,
+                max_workers=settings.LLM_POOL_SIZE,
+            )
+        return _llm_caller
@@ -0,0 +1,414 @@
+# src/agent/router.py
+"""
+Local intent router: decides, before any LLM call, whether a message is
+small-talk, an HR-policy question, a JISR-platform question, both, or out of
+scope.
+
+Two cheap passes:
+  1) Aho-Corasick keyword scan over normalized text (microseconds).
+  2) Cosine similarity between the query embedding and precomputed label
+     centroids (one embed_query call), only when keywords are inconclusive.
+     A canned reply (small-talk / out-of-scope) from this pass is off unless
+     an explicit margin is configured, and must then beat the best domain
+     centroid by it; otherwise the router answers UNKNOWN and the agent
+     decides, so a domain question is never refused on a near-tie.
+"""
+import functools
+import logging
+import re
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Dict, FrozenSet, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from src.ingestion.cleaning import _normalize_arabic
+
+logger = logging.getLogger(__name__)
+
+# ---- Labels ------------------------------------------------------------------
+SMALLTALK = "smalltalk"
+HR = "hr"
+JISR = "jisr"
+BOTH = "both"
+OUT_OF_SCOPE = "out_of_scope"
+UNKNOWN = "unknown"  # router is unsure -> let the agent pick tools itself
+_FACET = "facet"     # keyword table only (see FACETS), never a route
+
+# Route label -> tools to run directly (no LLM tool-choice round trip)
+ROUTE_TOOLS: Dict[str, List[str]] = {
+    HR: ["hr_search"],
+    JISR: ["jisr_search"],
+    BOTH: ["hr_search", "jisr_search"],
+}
+
+# Canned replies for routes that never reach the LLM
+SMALLTALK_ANSWER = "مرحبًا! كيف أقدر أساعدك اليوم؟ 😊"
+OUT_OF_SCOPE_ANSWER = ("أنا مساعد الموارد البشرية، وأستطيع الإجابة عن سياسات الموارد البشرية "
+                       "واستخدام منصة جسر فقط. كيف أقدر أساعدك في ذلك؟")
+
+# ---- Keyword tables ----------------------------------------------------------
+# Written in their *normalized* form (see _normalize): no hamza on alef,
+# ى → ي, lower-case Latin. Arabic domain keywords are stems: they may carry a
+# suffix and one of _PROCLITICS ("و", "بال", ...) but must otherwise start a
+# word ("سياسة" must not match "السياسية"); small-talk and Latin keywords must
+# match whole words ("hi" must not match "this"). Ambiguous English words
+# ("leave", "sick") only count inside a phrase.
+KEYWORDS: Dict[str, List[str]] = {
+    SMALLTALK: [
+        "hi", "hello", "hey", "hii", "good morning", "good evening", "good night",
+        "thanks", "thank you", "how are you",
+        "مرحبا", "السلام عليكم", "وعليكم السلام", "هلا", "هاي", "صباح الخير", "مساء الخير",
+        "كيف حالك", "شلونك", "كيفك", "اخبارك", "شكرا", "يعطيك العافيه",
+    ],
+    HR: [
+        "اجاز", "سياسة", "سياسه", "سياسات", "نهايه الخدمه", "نهاية الخدمة", "مكافا", "استقال",
+        "دوام", "ساعات العمل", "بدلات", "البدل", "تامين", "غياب", "تاخير", "انذار",
+        "ترقي", "تقييم الاداء", "فتره التجربه", "فترة التجربة", "عمل اضافي",
+        "annual leave", "sick leave", "maternity leave", "paid leave", "unpaid leave",
+        "leave balance", "leave request", "leave policy", "leave days", "on leave",
+        "vacation", "policy", "policies", "end of service", "resignation",
+        "overtime", "allowance", "probation", "attendance", "benefits",
+    ],
+    JISR: [
+        "جسر", "منصه", "منصة", "مسير الرواتب", "تسجيل الدخول", "كلمه المرور",
+        "كلمة المرور", "رفع طلب", "رفع الطلب", "التطبيق",
+        "jisr", "payroll run", "login", "log in", "password", "portal", "app",
+    ],
+}
+
+# Words that change the answer inside a domain (which leave, which employees).
+# They never route a message; they only tell apart near-identical questions
+# ("الإجازة السنوية" vs "الإجازة المرضية") in the answer cache, see cache_tag.
+FACETS: List[str] = [
+    "سنوي", "مرضي", "امومه", "امومة", "ابوه", "ابوة", "زواج", "وفاه", "وفاة", "حج",
+    "اضطراري", "استثنائي", "دراسي", "بدون راتب", "مدير", "مدراء", "متدرب", "سعودي",
+    "غير سعودي", "جزئي", "عن بعد",
+    "annual", "sick", "maternity", "paternity", "marriage", "bereavement", "hajj",
+    "emergency", "unpaid", "study", "manager", "managers", "intern", "interns",
+    "saudi", "non saudi", "part time", "remote",
+]
+
+# Prefixes allowed in front of an Arabic domain stem (conjunction, preposition,
+# article and their combinations), already normalized.
+_PROCLITICS = frozenset([
+    "", "و", "ف", "ب", "ل", "ك", "ال", "وال", "فال", "بال", "كال", "لل",
+    "ولل", "فلل", "وبال", "فبال", "وكال", "وب", "ول", "فب", "فل", "وك",
+])
+
+# Words that may accompany a greeting / thanks without making it a question
+# ("thanks a lot", "شكرا جزيلا"). Any other word next to a small-talk keyword
+# ("شكرا، وماذا عن المدراء؟") sends the message to the agent instead.
+SMALLTALK_FILLER = frozenset("""
+    a lot so much very you all there everyone guys again for your help the ok okay
+    dear bot sir friend too
+    يا لك لكم جزيلا كثير كثيرا الله ورحمه ورحمة وبركاته عليكم وعليكم اخي اختي صديقي
+    الخير بالخير جميعا اهلا وسهلا تمام حبيبي وياك
+""".split())
+
+# Short exemplars per label; averaged into one centroid per label at startup.
+EXEMPLARS: Dict[str, List[str]] = {
+    SMALLTALK: [
+        "مرحبا", "السلام عليكم", "كيف حالك", "شكرا لك", "صباح الخير",
+        "hello", "hi there", "how are you", "thanks a lot", "good morning",
+    ],
+    HR: [
+        "كم عدد أيام الإجازة السنوية", "كيف تحسب مكافأة نهاية الخدمة",
+        "ما هي سياسة العمل الإضافي", "ما هي ساعات الدوام الرسمية",
+        "ما هي مدة فترة التجربة", "what is the annual leave policy",
+        "how is end of service calculated", "what allowances do employees get",
+    ],
+    JISR: [
+        "كيف أرفع طلب إجازة في جسر", "كيف أسجل الدخول إلى منصة جسر",
+        "كيف أضيف موظف جديد في جسر", "كيف أشغل مسير الرواتب في جسر",
+        "how do I log in to jisr", "how to submit a request on the jisr app",
+        "how to run payroll in jisr",
+    ],
+    OUT_OF_SCOPE: [
+        "ما هي حالة الطقس اليوم", "من فاز بالمباراة أمس", "اكتب لي قصيدة",
+        "what is the weather today", "who won the football match",
+        "give me a recipe for pasta", "write me a poem", "what is the capital of france",
+    ],
+}
+
+# Embedding-pass min_score per model family. E5 squeezes cosine similarity
+# into a narrow high band (unrelated texts still score ~0.7+), so its absolute
+# cut-off is much higher than for MiniLM-style models. It only decides between
+# a routed HR/JISR answer and the agent; the out-of-scope margin has no
+# default because it decides refusals (set ROUTER_OOS_MARGIN to enable).
+CALIBRATION: Dict[str, Dict[str, float]] = {
+    "e5": {"min_score": 0.82},
+    "default": {"min_score": 0.45},
+}
+
+
+def default_thresholds(model_name: str) -> Dict[str, float]:
+    """Default min_score for an embedding model name."""
+    key = "e5" if "e5" in (model_name or "").lower() else "default"
+    return dict(CALIBRATION[key])
+
+
+_PUNCT = re.compile(r"[^\w\s]", flags=re.UNICODE)
+_WS = re.compile(r"\s+")
+
+
+def _normalize(text: str) -> str:
+    """Same Arabic normalization as ingestion, plus lower-case and no punctuation."""
+    t = _normalize_arabic(text or "").lower()
+    t = _PUNCT.sub(" ", t)
+    return _WS.sub(" ", t).strip()
+
+
+# ---- Aho-Corasick ------------------------------------------------------------
+class _AhoCorasick:
+    """Minimal Aho-Corasick automaton over characters (pure Python)."""
+
+    def __init__(self, patterns: Iterable[Tuple[str, Any]]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[Tuple[int, Any]]] = [[]]
+
+        for pat, payload in patterns:
+            if not pat:
+                continue
+            node = 0
+            for ch in pat:
+                nxt = self._goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[node][ch] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                node = nxt
+            self._out[node].append((len(pat), payload))
+
+        # BFS to build failure links
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self._goto[node].items():
+                queue.append(nxt)
+                f = self._fail[node]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                cand = self._goto[f].get(ch, 0)
+                self._fail[nxt] = cand if cand != nxt else 0
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def iter(self, text: str):
+        """Yield (start, end, payload) for every pattern occurrence."""
+        node = 0
+        for i, ch in enumerate(text):
+            while node and ch not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(ch, 0)
+            for length, payload in self._out[node]:
+                yield i - length + 1, i + 1, payload
+
+
+def _is_word_char(ch: str) -> bool:
+    return ch.isalnum() or ch == "_"
+
+
+@functools.lru_cache(maxsize=1)
+def _keyword_automaton() -> _AhoCorasick:
+    """One automaton over KEYWORDS and FACETS, shared by every router."""
+    tables = dict(KEYWORDS)
+    tables[_FACET] = FACETS
+    patterns = []
+    for label, words in tables.items():
+        for w in words:
+            w = _normalize(w)
+            whole_word = label == SMALLTALK or w.isascii()
+            patterns.append((w, (label, whole_word, w)))
+    return _AhoCorasick(patterns)
+
+
+def _scan(norm: str) -> Iterator[Tuple[int, int, str, str]]:
+    """Yield (start, end, label, keyword) for keyword hits on word boundaries."""
+    for start, end, (label, whole_word, keyword) in _keyword_automaton().iter(norm):
+        if end < len(norm) and whole_word and _is_word_char(norm[end]):
+            continue
+        if start > 0 and _is_word_char(norm[start - 1]):
+            if whole_word:
+                continue
+            word_start = start
+            while word_start > 0 and _is_word_char(norm[word_start - 1]):
+                word_start -= 1
+            if norm[word_start:start] not in _PROCLITICS:
+                continue
+        yield start, end, label, keyword
+
+
+def domain_terms(text: str) -> FrozenSet[str]:
+    """HR / JISR keywords and facets found in `text` (normalized forms)."""
+    return frozenset(kw for _, _, label, kw in _scan(_normalize(text)) if label != SMALLTALK)
+
+
+def cache_tag(text: str, label: str) -> str:
+    """
+    Answer-cache guard: two questions may share a cached answer only when they
+    route the same way and mention the same domain keywords and facets.
+    """
+    return "|".join([label, *sorted(domain_terms(text))])
+
+
+@dataclass
+class RouteDecision:
+    label: str
+    confidence: float = 0.0
+    method: str = "keywords"  # "keywords" | "embeddings" | "default"
+    scores: Dict[str, float] = field(default_factory=dict)
+
+
+class IntentRouter:
+    """
+    Classify a user message into SMALLTALK / HR / JISR / BOTH / OUT_OF_SCOPE,
+    or UNKNOWN when neither pass is confident (the agent then decides).
+    """
+
+    def __init__(
+        self,
+        embeddings: Optional[Any] = None,
+        min_score: float = 0.45,
+        both_margin: float = 0.04,
+        smalltalk_max_words: int = 3,
+        oos_margin: Optional[float] = None,
+    ):
+        self.min_score = min_score
+        self.both_margin = both_margin
+        self.oos_margin = oos_margin
+        self.smalltalk_max_words = smalltalk_max_words
+
+        self._filler = {_normalize(w) for w in SMALLTALK_FILLER}
+
+        self._embeddings = embeddings
+        self._centroid_labels: List[str] = []
+        self._centroids: Optional[np.ndarray] = None
+        if embeddings is not None:
+            self._build_centroids()
+
+    def _build_centroids(self) -> None:
+        # Exemplars are embedded as *queries* (E5 "query:" prefix), the same
+        # space the incoming messages are embedded in.
+        from src.rag.embeddings import embed_queries
+
+        texts: List[str] = []
+        owners: List[str] = []
+        for label, items in EXEMPLARS.items():
+            texts.extend(items)
+            owners.extend([label] * len(items))
+
+        vecs = np.asarray(embed_queries(self._embeddings, texts), dtype=np.float32)
+        vecs /= np.linalg.norm(vecs, axis=1, keepdims=True) + 1e-12
+
+        labels = list(EXEMPLARS.keys())
+        cents = []
+        for label in labels:
+            rows = [i for i, o in enumerate(owners) if o == label]
+            c = vecs[rows].mean(axis=0)
+            cents.append(c / (np.linalg.norm(c) + 1e-12))
+        self._centroid_labels = labels
+        self._centroids = np.stack(cents)
+        logger.info(f"Intent router centroids built for labels: {labels}")
+
+    def _keyword_hits(self, norm: str) -> Tuple[Dict[str, int], List[str]]:
+        """Return per-label hit counts and the words left once small-talk hits are removed."""
+        hits: Dict[str, int] = {}
+        smalltalk_spans: List[Tuple[int, int]] = []
+        for start, end, label, _ in _scan(norm):
+            hits[label] = hits.get(label, 0) + 1
+            if label == SMALLTALK:
+                smalltalk_spans.append((start, end))
+
+        residual = norm
+        for start, end in sorted(smalltalk_spans, reverse=True):
+            residual = residual[:start] + " " + residual[end:]
+        return hits, residual.split()
+
+    def _embedding_scores(self, text: str, query_vec: Optional[List[float]] = None) -> Dict[str, float]:
+        if self._centroids is None:
+            return {}
+        if query_vec is None:
+            query_vec = self._embeddings.embed_query(text)
+        q = np.array(query_vec, dtype=np.float32)
+        q /= np.linalg.norm(q) + 1e-12
+        sims = self._centroids @ q
+        return {label: float(s) for label, s in zip(self._centroid_labels, sims)}
+
+    def route(self, text: str, query_vec: Optional[List[float]] = None) -> RouteDecision:
+        """Route one message; pass `query_vec` when the query is already embedded."""
+        norm = _normalize(text)
+        if not norm:
+            return RouteDecision(SMALLTALK, 1.0, "keywords")
+
+        hits, residual = self._keyword_hits(norm)
+        domain = {lbl for lbl in (HR, JISR) if hits.get(lbl)}
+
+        # 1) Keywords
+        if hits.get(SMALLTALK) and not domain:
+            # "thanks a lot" is small-talk; "thanks, what about managers?" is a
+            # (follow-up) question the keyword tables cannot place
+            content = [w for w in residual if w not in self._filler]
+            if content or len(residual) > self.smalltalk_max_words:
+                return RouteDecision(UNKNOWN, 0.0, "keywords")
+            return RouteDecision(SMALLTALK, 1.0, "keywords")
+        if domain == {HR, JISR}:
+            return RouteDecision(BOTH, 1.0, "keywords")
+        if domain:
+            return RouteDecision(domain.pop(), 1.0, "keywords")
+
+        # 2) Embedding centroids
+        try:
+            scores = self._embedding_scores(text, query_vec)
+        except Exception as e:
+            logger.warning(f"Intent router embedding pass failed: {e}")
+            scores = {}
+        if not scores:
+            return RouteDecision(UNKNOWN, 0.0, "default")
+
+        best = max(scores, key=scores.get)
+        best_score = scores[best]
+        domain_score = max(scores.get(HR, -1.0), scores.get(JISR, -1.0))
+
+        if best in (SMALLTALK, OUT_OF_SCOPE):
+            # Canned replies skip retrieval entirely: only with a configured
+            # margin, and only on a clear win over the domain centroids.
+            if self.oos_margin is None or best_score - domain_score < self.oos_margin:
+                return RouteDecision(UNKNOWN, best_score, "default", scores)
+            if best == SMALLTALK and len(norm.split()) > self.smalltalk_max_words:
+                return RouteDecision(UNKNOWN, best_score, "default", scores)
+            return RouteDecision(best, best_score, "embeddings", scores)
+
+        if best_score < self.min_score:
+            return RouteDecision(UNKNOWN, best_score, "default", scores)
+
+        other = JISR if best == HR else HR
+        if best_score - scores.get(other, -1.0) <= self.both_margin:
+            return RouteDecision(BOTH, best_score, "embeddings", scores)
+        return RouteDecision(best, best_score, "embeddings", scores)
+
+def build_intent_router(settings: Any, embeddings: Optional[Any] = None) -> IntentRouter:
+    """Build the router; falls back to keyword-only when embeddings fail to load."""
+    if embeddings is None:
+        try:
+            from src.rag.embeddings import get_embeddings
+            embeddings = get_embeddings(settings)
+        except Exception as e:
+            logger.warning(f"Intent router running keyword-only (no embeddings): {e}")
+
+    # Unset min_score falls back to the default for the configured model; an
+    # unset ROUTER_OOS_MARGIN leaves embedding-based canned replies off
+    calib = default_thresholds(settings.HF_MODEL)
+    kwargs = dict(
+        min_score=settings.ROUTER_MIN_SCORE if settings.ROUTER_MIN_SCORE is not None else calib["min_score"],
+        oos_margin=settings.ROUTER_OOS_MARGIN,
+        both_margin=settings.ROUTER_BOTH_MARGIN,
+        smalltalk_max_words=settings.ROUTER_SMALLTALK_MAX_WORDS,
+    )
+    try:
+        return IntentRouter(embeddings, **kwargs)
+    except Exception as e:
+        logger.warning(f"Intent router centroid build failed, keyword-only: {e}")
+        return IntentRouter(None, **kwargs)
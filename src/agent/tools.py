@@ -5,9 +5,14 @@ from typing import List, Dict, Any, Tuple
 from langchain_core.tools import tool
 from langchain_core.documents import Document
 
+from src.ingestion.dedup import expand_citations
+
 # Soft cap for how much text we send back to the agent from tools
 MAX_CONTEXT_CHARS = int(os.getenv("MAX_CONTEXT_CHARS", "12000"))
 
+# Search tool name -> corpus metadata filter
+TOOL_CORPUS: Dict[str, str] = {"hr_search": "hr", "jisr_search": "jisr"}
+
 def _dedup_citations(items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
     """Deduplicate citations by (source, chunk, doc_title, corpus)."""
     seen: set[Tuple[str, int, str, str]] = set()
@@ -43,16 +48,10 @@ def _pack(docs: List[Document]) -> str:
     for d in docs:
         title = d.metadata.get("doc_title", "unknown")
         chunk = d.metadata.get("chunk", 0)
-        corpus = d.metadata.get("corpus", "")
-        src = d.metadata.get("source", "")
         text = d.page_content or ""
         ctx_blocks.append(f"[{title} :: #{chunk}]\n{text}")
-        citations.append({
-            "doc_title": title,
-            "chunk": chunk,
-            "source": src,
-            "corpus": corpus,
-        })
+        # A deduplicated chunk also cites every copy collapsed into it
+        citations.extend(expand_citations(d.metadata))
 
     # Join and trim the context (keep head, it’s usually most relevant)
     context = "\n\n".join(ctx_blocks)
@@ -63,6 +62,21 @@ def _pack(docs: List[Document]) -> str:
     payload = {"context": context, "citations": citations}
     return json.dumps(payload, ensure_ascii=False)
 
+def format_fallback_answer(docs: List[Document]) -> Dict[str, Any]:
+    """Retrieval-only answer (no LLM): the top chunks verbatim + citations."""
+    if not docs:
+        return {"answer": "لا توجد مصادر كافية للإجابة حالياً.", "citations": []}
+
+    chunks = []
+    for d in docs[:3]:
+        title = d.metadata.get("doc_title", "غير معروف")
+        chunk_idx = d.metadata.get("chunk", 0)
+        text = (d.page_content or "")[:400]
+        chunks.append(f"- [{title} :: #{chunk_idx}]\n{text}")
+    answer = "ملخص من المصادر (الوضع الاحتياطي):\n\n" + "\n\n".join(chunks)
+    citations = _dedup_citations([c for d in docs for c in expand_citations(d.metadata)])
+    return {"answer": answer, "citations": citations}
+
 def _coerce_k(top_k: Any, default_k: int) -> int:
     try:
         if top_k is None:
@@ -90,7 +104,7 @@ def build_tools(retriever, default_k: int):
           }
         """
         k = _coerce_k(top_k, default_k)
-        docs = retriever.get_relevant_documents(query, k=k, filter={"corpus": "hr"})
+        docs = retriever.get_relevant_documents(query, k=k, filter={"corpus": TOOL_CORPUS["hr_search"]})
         return _pack(docs)
 
     @tool("jisr_search", return_direct=False)
@@ -104,7 +118,7 @@ def build_tools(retriever, default_k: int):
           JSON string (نفس صيغة hr_search) ولكن corpus = "jisr".
         """
         k = _coerce_k(top_k, default_k)
-        docs = retriever.get_relevant_documents(query, k=k, filter={"corpus": "jisr"})
+        docs = retriever.get_relevant_documents(query, k=k, filter={"corpus": TOOL_CORPUS["jisr_search"]})
         return _pack(docs)
 
     return [hr_search, jisr_search]
@@ -1,4 +1,6 @@
 import os
+from typing import Optional
+
 from pydantic import BaseModel
 
 class Settings(BaseModel):
@@ -7,6 +9,60 @@ class Settings(BaseModel):
     DEFAULT_TOP_K: int = int(os.getenv("DEFAULT_TOP_K", "5"))
     MAX_CHUNK_TOKENS: int = int(os.getenv("MAX_CHUNK_TOKENS", "800"))
     CHUNK_OVERLAP: int = int(os.getenv("CHUNK_OVERLAP", "120"))
+    # Near-duplicate / boilerplate removal at ingestion (src/ingestion/dedup.py)
+    DEDUP_ENABLED: bool = os.getenv("DEDUP_ENABLED", "1") not in ("0", "false", "False")
+    DEDUP_THRESHOLD: float = float(os.getenv("DEDUP_THRESHOLD", "0.85"))
+    DEDUP_NUM_PERM: int = int(os.getenv("DEDUP_NUM_PERM", "128"))
+    DEDUP_BANDS: int = int(os.getenv("DEDUP_BANDS", "16"))
+    DEDUP_BOILERPLATE_MIN_REPEATS: int = int(os.getenv("DEDUP_BOILERPLATE_MIN_REPEATS", "3"))
+    # MMR retrieval: fetch_k = max(DEFAULT_TOP_K * MMR_FETCH_K_MULT, MMR_FETCH_K_MIN)
+    MMR_FETCH_K_MULT: int = int(os.getenv("MMR_FETCH_K_MULT", "3"))
+    MMR_FETCH_K_MIN: int = int(os.getenv("MMR_FETCH_K_MIN", "8"))
+    MMR_LAMBDA: float = float(os.getenv("MMR_LAMBDA", "0.5"))
+    # Two-level retrieval: pick HIER_TOP_DOCS documents, then search their chunks
+    HIERARCHICAL_RETRIEVAL: bool = os.getenv("HIERARCHICAL_RETRIEVAL", "1") not in ("0", "false", "False")
+    HIER_TOP_DOCS: int = int(os.getenv("HIER_TOP_DOCS", "5"))
     EMBEDDINGS_PROVIDER: str = os.getenv("EMBEDDINGS_PROVIDER", "hf")
     HF_MODEL: str = os.getenv("HF_MODEL", "sentence-transformers/all-MiniLM-L12-v2")
+    # Query-embedding micro-batching across concurrent requests
+    EMBED_BATCH_ENABLED: bool = os.getenv("EMBED_BATCH_ENABLED", "1") not in ("0", "false", "False")
+    EMBED_BATCH_WINDOW_MS: float = float(os.getenv("EMBED_BATCH_WINDOW_MS", "3"))
+    EMBED_BATCH_MAX_SIZE: int = int(os.getenv("EMBED_BATCH_MAX_SIZE", "32"))
+    EMBED_BATCH_TIMEOUT_S: float = float(os.getenv("EMBED_BATCH_TIMEOUT_S", "10"))  # then embed directly
     GROQ_MODEL: str = os.getenv("GROQ_MODEL", "openai/gpt-oss-120b")
+
+    # Intent router (src/agent/router.py)
+    ROUTER_ENABLED: bool = os.getenv("ROUTER_ENABLED", "1") not in ("0", "false", "False")
+    # Unset -> default per embedding model (router.CALIBRATION)
+    ROUTER_MIN_SCORE: Optional[float] = float(os.environ["ROUTER_MIN_SCORE"]) if os.getenv("ROUTER_MIN_SCORE") else None
+    # Unset -> no embedding-based small-talk / out-of-scope replies
+    ROUTER_OOS_MARGIN: Optional[float] = float(os.environ["ROUTER_OOS_MARGIN"]) if os.getenv("ROUTER_OOS_MARGIN") else None
+    ROUTER_BOTH_MARGIN: float = float(os.getenv("ROUTER_BOTH_MARGIN", "0.04"))
+    ROUTER_SMALLTALK_MAX_WORDS: int = int(os.getenv("ROUTER_SMALLTALK_MAX_WORDS", "3"))
+
+    # Semantic answer cache (src/rag/answer_cache.py); empty path = memory only,
+    # otherwise a file prefix: <path>.json (entries) + <path>.npy (vectors)
+    ANSWER_CACHE_ENABLED: bool = os.getenv("ANSWER_CACHE_ENABLED", "1") not in ("0", "false", "False")
+    # Unset -> default per embedding model (answer_cache.CALIBRATION)
+    ANSWER_CACHE_THRESHOLD: Optional[float] = float(os.environ["ANSWER_CACHE_THRESHOLD"]) if os.getenv("ANSWER_CACHE_THRESHOLD") else None
+    ANSWER_CACHE_MAX_ENTRIES: int = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "1000"))
+    ANSWER_CACHE_PATH: str = os.getenv("ANSWER_CACHE_PATH", "")
+
+    # LLM resilience (src/agent/resilience.py); LLM_HEDGE_AFTER_S=0 disables hedging
+    LLM_TIMEOUT_S: float = float(os.getenv("LLM_TIMEOUT_S", "20"))
+    LLM_DEADLINE_S: float = float(os.getenv("LLM_DEADLINE_S", "45"))
+    LLM_MAX_RETRIES: int = int(os.getenv("LLM_MAX_RETRIES", "2"))
+    LLM_BACKOFF_BASE_S: float = float(os.getenv("LLM_BACKOFF_BASE_S", "0.5"))
+    LLM_BACKOFF_MAX_S: float = float(os.getenv("LLM_BACKOFF_MAX_S", "4"))
+    LLM_HEDGE_AFTER_S: float = float(os.getenv("LLM_HEDGE_AFTER_S", "0"))
+    LLM_BREAKER_FAILURES: int = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+    LLM_BREAKER_RESET_S: float = float(os.getenv("LLM_BREAKER_RESET_S", "30"))
+    # Total LLM time for one /chat turn (agent turns make several calls)
+    LLM_REQUEST_DEADLINE_S: float = float(os.getenv("LLM_REQUEST_DEADLINE_S", "60"))
+    # Worker threads for LLM attempts; abandoned attempts hold one until LLM_TIMEOUT_S
+    LLM_POOL_SIZE: int = int(os.getenv("LLM_POOL_SIZE", "64"))
+
+    # Batch answering (/chat/batch, tools/batch_answer.py)
+    BATCH_MAX_QUESTIONS: int = int(os.getenv("BATCH_MAX_QUESTIONS", "1000"))
+    BATCH_CONCURRENCY: int = int(os.getenv("BATCH_CONCURRENCY", "4"))
+    BATCH_MAX_CONCURRENCY: int = int(os.getenv("BATCH_MAX_CONCURRENCY", "16"))  # cap on client-requested concurrency
@@ -1,9 +1,12 @@
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 
+from src.ingestion.cleaning import PAGE_BREAK
+
 def chunk_text(text: str, max_tokens=800, overlap=120):
     splitter = RecursiveCharacterTextSplitter(
         chunk_size=max_tokens * 4,
         chunk_overlap=overlap * 4,
         separators=["\n\n", "\n", ".", "،", " "],
     )
-    return splitter.split_text(text or "")
+    # Page breaks are only needed up to boilerplate removal; split on them as paragraphs
+    return splitter.split_text((text or "").replace(PAGE_BREAK, "\n\n"))
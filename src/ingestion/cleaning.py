@@ -2,6 +2,10 @@
 import re
 from typing import Dict
 
+# Page separator in loaded PDF text (pdfminer emits it too); kept through
+# cleaning so dedup.strip_boilerplate can find running headers/footers
+PAGE_BREAK = "\f"
+
 # Arabic combining marks (tashkeel/diacritics)
 _AR_TASHKEEL = re.compile(r"[\u0610-\u061A\u064B-\u065F\u06D6-\u06ED]")
 
@@ -60,9 +64,10 @@ def _normalize_arabic(text: str) -> str:
 def clean_document(doc: Dict) -> Dict:
     """
     Input: {'text': str, 'meta': {...}}
-    Output: normalized Arabic text (no change to meta)
+    Output: normalized Arabic text (no change to meta). Page breaks
+    (PAGE_BREAK) survive: each page is normalized on its own.
     """
     text = (doc.get("text") or "")
-    text = _normalize_arabic(text)
+    text = PAGE_BREAK.join(_normalize_arabic(page) for page in text.split(PAGE_BREAK))
     meta = dict(doc.get("meta") or {})
     return {"text": text, "meta": meta}
@@ -0,0 +1,205 @@
+# src/ingestion/dedup.py
+"""
+Redundancy removal at ingestion time.
+
+1) strip_boilerplate: lines repeated at page edges across the corpus (PDF
+   running headers/footers) are kept once per document; page bodies are
+   left alone.
+2) collapse_near_duplicates: MinHash + LSH over word shingles finds chunks
+   that are near-identical (within the same corpus). Each group is collapsed
+   into its first chunk, which keeps every other copy's citation in the
+   "also_in" metadata field (JSON string; Chroma metadata must be scalar).
+   The document index counts a collapsed chunk as part of every document in
+   "also_in", so retrieval scoped to a duplicate document still finds it.
+"""
+import json
+import re
+import zlib
+from collections import Counter, defaultdict
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from src.ingestion.cleaning import PAGE_BREAK
+
+_PRIME = (1 << 31) - 1  # Mersenne prime; a * crc32 stays inside int64
+_SEED = 1234
+
+
+_DIGITS = re.compile(r"[0-9\u0660-\u0669\u06F0-\u06F9]+")
+
+
+def _norm_line(line: str) -> str:
+    # Digits collapsed so "صفحة 3 من 10" and "صفحة 4 من 10" count as one footer
+    return _DIGITS.sub("0", " ".join(line.split()).lower())
+
+
+def _edge_lines(lines: List[str], edge: int) -> set:
+    """Indexes of the first / last `edge` non-empty lines of a page."""
+    filled = [i for i, line in enumerate(lines) if line.strip()]
+    return set(filled[:edge]) | set(filled[-edge:]) if edge > 0 else set()
+
+
+def strip_boilerplate(
+    docs: List[dict], min_repeats: int = 3, min_chars: int = 8, edge_lines: int = 2,
+) -> Tuple[List[dict], Dict[str, int]]:
+    """
+    Drop running headers/footers. Only the first / last `edge_lines` lines of
+    each page (pages split on PAGE_BREAK) are candidates; one seen there on at
+    least `min_repeats` pages across the corpus is boilerplate, and its page-edge
+    occurrences are dropped except the first per document. Lines inside a page
+    body are never removed, however often they repeat. Pages are re-joined with
+    blank lines.
+    """
+    paged = [[page.splitlines() for page in (d.get("text") or "").split(PAGE_BREAK)] for d in docs]
+
+    counts: Counter = Counter()
+    for pages in paged:
+        for lines in pages:
+            edges = {_norm_line(lines[i]) for i in _edge_lines(lines, edge_lines)}
+            counts.update(n for n in edges if len(n) >= min_chars)
+    boiler = {ln for ln, c in counts.items() if c >= min_repeats}
+
+    removed_lines = 0
+    removed_chars = 0
+    out: List[dict] = []
+    for d, pages in zip(docs, paged):
+        seen = set()
+        kept_pages = []
+        for lines in pages:
+            edges = _edge_lines(lines, edge_lines) if boiler else set()
+            kept = []
+            for i, line in enumerate(lines):
+                n = _norm_line(line) if i in edges else None
+                if n in boiler:
+                    if n in seen:
+                        removed_lines += 1
+                        removed_chars += len(line)
+                        continue
+                    seen.add(n)
+                kept.append(line)
+            kept_pages.append("\n".join(kept))
+        out.append({"text": "\n\n".join(p for p in kept_pages if p.strip()), "meta": d.get("meta", {})})
+
+    return out, {
+        "boilerplate_patterns": len(boiler),
+        "boilerplate_lines_removed": removed_lines,
+        "boilerplate_chars_removed": removed_chars,
+    }
+
+
+def _shingles(text: str, size: int) -> np.ndarray:
+    words = text.lower().split()
+    if len(words) <= size:
+        grams = [" ".join(words)]
+    else:
+        grams = [" ".join(words[i:i + size]) for i in range(len(words) - size + 1)]
+    return np.array(sorted({zlib.crc32(g.encode("utf-8")) for g in grams}), dtype=np.int64)
+
+
+class MinHasher:
+    """MinHash signatures with universal hashing (a*x + b) mod p."""
+
+    def __init__(self, num_perm: int = 128, seed: int = _SEED):
+        rng = np.random.RandomState(seed)
+        self.a = rng.randint(1, _PRIME, size=num_perm, dtype=np.int64)
+        self.b = rng.randint(0, _PRIME, size=num_perm, dtype=np.int64)
+
+    def signature(self, shingles: np.ndarray) -> np.ndarray:
+        # (num_shingles, num_perm) -> min over shingles
+        hashed = (np.outer(shingles, self.a) + self.b) % _PRIME
+        return hashed.min(axis=0)
+
+
+def _citation(meta: dict) -> dict:
+    return {
+        "doc_title": meta.get("doc_title", "unknown"),
+        "chunk": meta.get("chunk", 0),
+        "source": meta.get("source", ""),
+        "corpus": meta.get("corpus", ""),
+    }
+
+
+def collapse_near_duplicates(
+    records: List[Tuple[str, dict]],
+    threshold: float = 0.85,
+    num_perm: int = 128,
+    bands: int = 16,
+    shingle_size: int = 4,
+) -> Tuple[List[Tuple[str, dict]], Dict[str, int]]:
+    """
+    Collapse near-duplicate (text, metadata) records. Records are compared
+    only within the same corpus so corpus filters keep working.
+    Returns (kept records, stats).
+    """
+    n = len(records)
+    if n < 2:
+        return records, {"chunks_before": n, "chunks_after": n, "duplicates_collapsed": 0}
+
+    rows = max(1, num_perm // bands)
+    hasher = MinHasher(rows * bands)
+    sigs = np.stack([hasher.signature(_shingles(text, shingle_size)) for text, _ in records])
+
+    # LSH: records sharing any band bucket (within a corpus) are candidates
+    buckets: Dict[tuple, List[int]] = defaultdict(list)
+    for i, (_, meta) in enumerate(records):
+        corpus = meta.get("corpus", "")
+        for b in range(bands):
+            key = (corpus, b, sigs[i, b * rows:(b + 1) * rows].tobytes())
+            buckets[key].append(i)
+
+    # Union-find over verified pairs; the lowest index is the representative
+    parent = list(range(n))
+
+    def find(x: int) -> int:
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    checked = set()
+    for members in buckets.values():
+        if len(members) < 2:
+            continue
+        for idx, i in enumerate(members):
+            for j in members[idx + 1:]:
+                if (i, j) in checked:
+                    continue
+                checked.add((i, j))
+                if float(np.mean(sigs[i] == sigs[j])) >= threshold:
+                    ri, rj = find(i), find(j)
+                    if ri != rj:
+                        parent[max(ri, rj)] = min(ri, rj)
+
+    groups: Dict[int, List[int]] = defaultdict(list)
+    for i in range(n):
+        groups[find(i)].append(i)
+
+    kept: List[Tuple[str, dict]] = []
+    for i in range(n):
+        if find(i) != i:
+            continue
+        text, meta = records[i]
+        dups = groups[i][1:]
+        if dups:
+            meta = dict(meta)
+            meta["also_in"] = json.dumps([_citation(records[j][1]) for j in dups], ensure_ascii=False)
+        kept.append((text, meta))
+
+    return kept, {
+        "chunks_before": n,
+        "chunks_after": len(kept),
+        "duplicates_collapsed": n - len(kept),
+    }
+
+
+def expand_citations(meta: dict) -> List[dict]:
+    """Citation for a stored chunk plus every collapsed duplicate it stands for."""
+    items = [_citation(meta)]
+    extra = meta.get("also_in")
+    if extra:
+        try:
+            items.extend(json.loads(extra))
+        except Exception:
+            pass
+    return items
@@ -1,13 +1,15 @@
 # src/ingestion/ingest_pipeline.py
 from pathlib import Path
 from tqdm import tqdm
-from typing import Dict, List, Tuple
+from typing import Any, Dict, List, Tuple
 
 from src.ingestion.loaders import load_documents
 from src.ingestion.cleaning import clean_document
 from src.ingestion.chunking import chunk_text
+from src.ingestion.dedup import strip_boilerplate, collapse_near_duplicates
 from src.rag.embeddings import get_embeddings
-from src.rag.store import get_vector_store
+from src.rag.store import get_vector_store, get_doc_store
+from src.rag.doc_index import build_document_index
 from src.config import Settings
 
 # Raw sources
@@ -25,6 +27,78 @@ def _infer_corpus(src_path: str) -> str:
     return "unknown"
 
 
+def chunk_documents(
+    cleaned: List[dict], max_tokens: int, overlap: int
+) -> Tuple[List[Tuple[str, dict]], Dict[str, int]]:
+    """
+    Split cleaned documents into (text, metadata) records tagged with chunk
+    index + corpus. Returns (records, per-corpus chunk counts).
+    """
+    records: List[Tuple[str, dict]] = []
+    corpus_counts: Dict[str, int] = {"hr": 0, "jisr": 0, "unknown": 0}
+
+    for d in tqdm(cleaned, desc="Chunking"):
+        text = d.get("text", "") or ""
+        meta = d.get("meta", {}) or {}
+
+        chunks = chunk_text(text, max_tokens, overlap)
+
+        # Prefer loader-provided corpus; fallback to path inference
+        src_path = meta.get("source", "")
+        corpus = meta.get("corpus") or _infer_corpus(src_path)
+
+        for i, ch in enumerate(chunks):
+            ch = (ch or "").strip()
+            if not ch:
+                continue  # skip empty after cleaning/splitting
+
+            # Preserve original metadata and add chunk index + corpus tag
+            ch_meta = dict(meta) | {"chunk": i, "corpus": corpus}
+            records.append((ch, ch_meta))
+            corpus_counts[corpus] = corpus_counts.get(corpus, 0) + 1
+
+    return records, corpus_counts
+
+
+def prepare_records(
+    cleaned: List[dict], settings: Settings, max_tokens: int, overlap: int
+) -> Tuple[List[Tuple[str, dict]], Dict[str, int], Dict[str, Any]]:
+    """
+    Cleaned documents -> (records, per-corpus counts, dedup stats): boilerplate
+    stripping, chunking and near-duplicate collapsing, the de-dup steps only
+    when DEDUP_ENABLED. Shared by ingestion and tools/retrieval_sweep.py.
+    """
+    # Drop repeated page headers/footers (kept once per document)
+    dedup_stats: Dict[str, Any] = {}
+    if settings.DEDUP_ENABLED:
+        cleaned, dedup_stats = strip_boilerplate(cleaned, settings.DEDUP_BOILERPLATE_MIN_REPEATS)
+
+    records, corpus_counts = chunk_documents(cleaned, max_tokens, overlap)
+
+    # Collapse near-duplicate chunks (MinHash/LSH); survivors keep all citations
+    if settings.DEDUP_ENABLED:
+        chars_before = sum(len(r[0]) for r in records)
+        records, chunk_stats = collapse_near_duplicates(
+            records,
+            threshold=settings.DEDUP_THRESHOLD,
+            num_perm=settings.DEDUP_NUM_PERM,
+            bands=settings.DEDUP_BANDS,
+        )
+        chars_after = sum(len(r[0]) for r in records)
+        dedup_stats.update(chunk_stats)
+        dedup_stats["chars_before"] = chars_before + dedup_stats.get("boilerplate_chars_removed", 0)
+        dedup_stats["chars_after"] = chars_after
+        dedup_stats["shrink_pct"] = round(
+            100.0 * (1 - chars_after / dedup_stats["chars_before"]), 1
+        ) if dedup_stats["chars_before"] else 0.0
+
+        corpus_counts = {"hr": 0, "jisr": 0, "unknown": 0}
+        for _, meta in records:
+            corpus_counts[meta["corpus"]] = corpus_counts.get(meta["corpus"], 0) + 1
+
+    return records, corpus_counts, dedup_stats
+
+
 def run_ingestion(settings: Settings, source: str = "all"):
     """
     Ingest documents from the requested sources, clean, chunk, and store in Chroma.
@@ -34,7 +108,8 @@ def run_ingestion(settings: Settings, source: str = "all"):
         source: "all" | "policies" | "jisr"
 
     Returns:
-        dict with ingestion stats, including per-corpus counts.
+        dict with ingestion stats, including per-corpus counts and the list
+        of source files that were (re-)ingested.
     """
     # 1) Collect folders to scan
     folders: List[Path] = []
@@ -51,33 +126,12 @@ def run_ingestion(settings: Settings, source: str = "all"):
     # 3) Normalize/clean text (Arabic normalization, etc.)
     cleaned = [clean_document(d) for d in all_docs]
 
-    # 4) Chunk and tag metadata
-    records: List[Tuple[str, dict]] = []
-    corpus_counts: Dict[str, int] = {"hr": 0, "jisr": 0, "unknown": 0}
-
-    for d in tqdm(cleaned, desc="Chunking"):
-        text = d.get("text", "") or ""
-        meta = d.get("meta", {}) or {}
+    # 4) De-duplicate (if enabled), chunk and tag metadata
+    records, corpus_counts, dedup_stats = prepare_records(
+        cleaned, settings, settings.MAX_CHUNK_TOKENS, settings.CHUNK_OVERLAP,
+    )
 
-        chunks = chunk_text(
-            text,
-            settings.MAX_CHUNK_TOKENS,
-            settings.CHUNK_OVERLAP,
-        )
-
-        # Prefer loader-provided corpus; fallback to path inference
-        src_path = meta.get("source", "")
-        corpus = meta.get("corpus") or _infer_corpus(src_path)
-
-        for i, ch in enumerate(chunks):
-            ch = (ch or "").strip()
-            if not ch:
-                continue  # skip empty after cleaning/splitting
-
-            # Preserve original metadata and add chunk index + corpus tag
-            ch_meta = dict(meta) | {"chunk": i, "corpus": corpus}
-            records.append((ch, ch_meta))
-            corpus_counts[corpus] = corpus_counts.get(corpus, 0) + 1
+    sources = sorted({(d.get("meta") or {}).get("source", "") for d in all_docs} - {""})
 
     if not records:
         return {
@@ -85,6 +139,8 @@ def run_ingestion(settings: Settings, source: str = "all"):
             "files": len(all_docs),
             "by_corpus": corpus_counts,
             "source": source,
+            "sources": sources,
+            "dedup": dedup_stats,
         }
 
     # 5) Get embeddings + vector store
@@ -94,7 +150,10 @@ def run_ingestion(settings: Settings, source: str = "all"):
     # 6) Add to Chroma
     texts = [r[0] for r in records]
     metadatas = [r[1] for r in records]
-    vs.add_texts(texts=texts, metadatas=metadatas)
+    ids = vs.add_texts(texts=texts, metadatas=metadatas)
+
+    # 6b) Document-level vectors for hierarchical retrieval
+    n_docs = build_document_index(vs, get_doc_store(settings, embeddings), ids, metadatas)
 
     # 7) Persist to disk (best effort)
     try:
@@ -107,6 +166,9 @@ def run_ingestion(settings: Settings, source: str = "all"):
     return {
         "ingested": len(texts),
         "files": len(all_docs),
+        "documents_indexed": n_docs,
         "by_corpus": corpus_counts,
         "source": source,
+        "sources": sources,
+        "dedup": dedup_stats,
     }
@@ -11,6 +11,8 @@ except Exception:  # pragma: no cover
 from pdfminer.high_level import extract_text as pdf_extract
 from docx import Document
 
+from src.ingestion.cleaning import PAGE_BREAK
+
 SUPPORTED_EXTS = {".pdf", ".docx", ".txt", ".md"}
 
 # -------- Arabic heuristics --------
@@ -32,7 +34,7 @@ def _extract_pdf_pymupdf(path: str) -> str:
         with fitz.open(path) as doc:
             for page in doc:
                 out.append(page.get_text("text"))
-        return "\n".join(out)
+        return PAGE_BREAK.join(out)  # pages stay separable (see dedup.strip_boilerplate)
     except Exception:
         return ""
 
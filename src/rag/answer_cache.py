@@ -0,0 +1,296 @@
+# src/rag/answer_cache.py
+"""
+Semantic answer cache for /chat.
+
+Entries are keyed on the embedding of the normalized query; a lookup hits when
+cosine similarity with a stored query is >= threshold and both carry the same
+tag (route label + domain keywords, see router.cache_tag): embeddings alone put
+"annual leave" and "sick leave" questions within a hair of each other, E5
+especially. The threshold is chosen per embedding model family. Each entry keeps the
+final answer + citations, plus the sources of every document retrieved while
+answering (not just the ones the model chose to cite), so it can be dropped
+when any of them is re-ingested or removed.
+
+Persistence is write-behind: changes mark the cache dirty and a background
+thread writes `<path>.json` (metadata) + `<path>.npy` (vectors) after a short
+quiet period, outside the lookup lock.
+"""
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+from src.ingestion.cleaning import _normalize_arabic
+
+logger = logging.getLogger(__name__)
+
+
+# Default similarity threshold per model family (cf. router.CALIBRATION): E5
+# scores near-miss questions far higher than MiniLM-style models do.
+CALIBRATION: Dict[str, float] = {
+    "e5": 0.97,
+    "default": 0.95,
+}
+
+
+def default_threshold(model_name: str) -> float:
+    """Default cache similarity threshold for an embedding model name."""
+    return CALIBRATION["e5" if "e5" in (model_name or "").lower() else "default"]
+
+
+def _normalize_query(text: str) -> str:
+    return " ".join(_normalize_arabic(text or "").lower().split())
+
+
+class AnswerCache:
+    """Thread-safe, size-bounded (LRU) semantic cache with optional on-disk persistence."""
+
+    def __init__(
+        self,
+        embeddings: Any,
+        threshold: float = 0.95,
+        max_entries: int = 1000,
+        path: Optional[str] = None,
+        save_delay: float = 1.0,
+    ):
+        self._embeddings = embeddings
+        self.threshold = threshold
+        self.max_entries = max(1, int(max_entries))
+        # "<dir>/answers" or "<dir>/answers.json" -> answers.json + answers.npy
+        self.path = os.path.splitext(path)[0] if path else None
+        self.save_delay = max(0.0, save_delay)
+
+        self._lock = threading.Lock()
+        # norm_query -> {"vec", "answer", "citations", "sources": list, "tag", "ts"};
+        # entries are replaced, never mutated, so snapshots can be written unlocked
+
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._matrix: Optional[np.ndarray] = None  # stacked vectors, rebuilt lazily
+        self._keys: List[str] = []
+        self._tags: List[Optional[str]] = []
+        self.hits = 0
+        self.misses = 0
+
+        self._dirty = threading.Event()
+        self._save_lock = threading.Lock()  # one writer at a time
+        if self.path:
+            self._load()
+            threading.Thread(target=self._save_loop, name="answer-cache-save", daemon=True).start()
+            atexit.register(self.flush)
+
+    # ---- Lookup / store ------------------------------------------------------
+    def _embed(self, norm: str) -> np.ndarray:
+        v = np.asarray(self._embeddings.embed_query(norm), dtype=np.float32)
+        return v / (np.linalg.norm(v) + 1e-12)
+
+    def _ensure_matrix(self) -> None:
+        if self._matrix is None:
+            self._keys = list(self._entries.keys())
+            self._tags = [self._entries[k]["tag"] for k in self._keys]
+            self._matrix = np.stack([self._entries[k]["vec"] for k in self._keys]) if self._keys else None
+
+    def lookup(self, query: str, tag: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Return {"answer", "citations"} for a semantically equivalent query, or
+        None. A similar entry only counts when it was stored with the same `tag`.
+        """
+        norm = _normalize_query(query)
+        if not norm:
+            return None
+
+        with self._lock:
+            entry = self._entries.get(norm)
+            if entry is not None:  # exact match: no embedding needed
+                self._entries.move_to_end(norm)
+                self.hits += 1
+                return {"answer": entry["answer"], "citations": entry["citations"]}
+            if not self._entries:
+                self.misses += 1
+                return None
+
+        vec = self._embed(norm)
+
+        with self._lock:
+            self._ensure_matrix()
+            if self._matrix is None:
+                self.misses += 1
+                return None
+            sims = self._matrix @ vec
+            sims[[t != tag for t in self._tags]] = -1.0
+            best = int(np.argmax(sims))
+            if float(sims[best]) < self.threshold:
+                self.misses += 1
+                return None
+            key = self._keys[best]
+            entry = self._entries[key]
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return {"answer": entry["answer"], "citations": entry["citations"]}
+
+    def store(
+        self,
+        query: str,
+        answer: str,
+        citations: List[Dict[str, Any]],
+        sources: Optional[Iterable[str]] = None,
+        tag: Optional[str] = None,
+    ) -> None:
+        """
+        Cache an answer. `sources` are the sources of the documents retrieved
+        for it; cited sources are added so the entry is never under-invalidated.
+        `tag` must match on lookup for a non-exact hit.
+        """
+        norm = _normalize_query(query)
+        if not norm or not answer:
+            return
+        vec = self._embed(norm)
+        citations = list(citations or [])
+        srcs = {str(s) for s in (sources or []) if s}
+        srcs.update(str(c["source"]) for c in citations if c.get("source"))
+
+        with self._lock:
+            self._entries[norm] = {
+                "vec": vec,
+                "answer": answer,
+                "citations": citations,
+                "sources": sorted(srcs),
+                "tag": tag,
+                "ts": time.time(),
+            }
+            self._entries.move_to_end(norm)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._matrix = None
+        self._dirty.set()
+
+    # ---- Invalidation --------------------------------------------------------
+    def _drop_where(self, pred) -> int:
+        with self._lock:
+            doomed = [k for k, e in self._entries.items() if pred(e)]
+            for k in doomed:
+                del self._entries[k]
+            if doomed:
+                self._matrix = None
+        if doomed:
+            self._dirty.set()
+        return len(doomed)
+
+    def invalidate_sources(self, sources: Iterable[str]) -> int:
+        """Drop every entry built from any of `sources` (e.g. files just re-ingested)."""
+        srcs = {str(s) for s in sources if s}
+        if not srcs:
+            return 0
+        n = self._drop_where(lambda e: not srcs.isdisjoint(e["sources"]))
+        if n:
+            logger.info(f"Answer cache: invalidated {n} entries for re-ingested sources")
+        return n
+
+    def prune_missing(self) -> int:
+        """Drop every entry built from a source file that no longer exists on disk."""
+        n = self._drop_where(lambda e: any(not os.path.exists(s) for s in e["sources"]))
+        if n:
+            logger.info(f"Answer cache: invalidated {n} entries for removed sources")
+        return n
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._matrix = None
+        self._dirty.set()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+    # ---- Persistence (best effort, write-behind) -----------------------------
+    def _save_loop(self) -> None:
+        while True:
+            self._dirty.wait()
+            time.sleep(self.save_delay)  # debounce bursts of stores
+            self.flush()
+
+    def flush(self) -> None:
+        """Write pending changes now (also runs at interpreter exit)."""
+        if not self.path or not self._dirty.is_set():
+            return
+        with self._save_lock:
+            self._dirty.clear()
+            with self._lock:
+                items = list(self._entries.items())  # cheap: references only
+            try:
+                self._write(items)
+            except Exception as e:
+                logger.warning(f"Answer cache save failed: {e}")
+
+    def _write(self, items: List[tuple]) -> None:
+        """Atomically replace <path>.npy and <path>.json with `items` (LRU order)."""
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        meta = [
+            {
+                "query": k,
+                "answer": e["answer"],
+                "citations": e["citations"],
+                "sources": e["sources"],
+                "tag": e["tag"],
+                "ts": e["ts"],
+            }
+            for k, e in items
+        ]
+        vecs = np.stack([e["vec"] for _, e in items]) if items else np.zeros((0, 0), dtype=np.float32)
+
+        tmp_npy, tmp_json = f"{self.path}.tmp.npy", f"{self.path}.json.tmp"
+        np.save(tmp_npy, vecs.astype(np.float32, copy=False))
+        with open(tmp_json, "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+        # Vectors first: the JSON decides how many rows are read back
+        os.replace(tmp_npy, f"{self.path}.npy")
+        os.replace(tmp_json, f"{self.path}.json")
+
+    def _load(self) -> None:
+        meta_path, vec_path = f"{self.path}.json", f"{self.path}.npy"
+        if not (os.path.exists(meta_path) and os.path.exists(vec_path)):
+            return
+        try:
+            with open(meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+            vecs = np.load(vec_path)
+            if len(vecs) != len(meta):
+                raise ValueError(f"{len(meta)} entries but {len(vecs)} vectors")
+            start = max(0, len(meta) - self.max_entries)
+            for item, vec in zip(meta[start:], vecs[start:]):
+                self._entries[item["query"]] = {
+                    "vec": np.asarray(vec, dtype=np.float32),
+                    "answer": item["answer"],
+                    "citations": item.get("citations", []),
+                    "sources": item.get("sources", []),
+                    "tag": item.get("tag"),
+                    "ts": item.get("ts", 0.0),
+                }
+            logger.info(f"Answer cache loaded {len(self._entries)} entries from {meta_path}")
+        except Exception as e:
+            logger.warning(f"Answer cache load failed, starting empty: {e}")
+            self._entries.clear()
+
+
+def build_answer_cache(settings: Any) -> Optional[AnswerCache]:
+    """Return an AnswerCache, or None when disabled / embeddings unavailable."""
+    if not settings.ANSWER_CACHE_ENABLED:
+        return None
+    try:
+        from src.rag.embeddings import get_embeddings
+        return AnswerCache(
+            get_embeddings(settings),
+            threshold=(settings.ANSWER_CACHE_THRESHOLD if settings.ANSWER_CACHE_THRESHOLD is not None
+                       else default_threshold(settings.HF_MODEL)),
+            max_entries=settings.ANSWER_CACHE_MAX_ENTRIES,
+            path=settings.ANSWER_CACHE_PATH,
+        )
+    except Exception as e:
+        logger.warning(f"Answer cache disabled: {e}")
+        return None
@@ -0,0 +1,151 @@
+# src/rag/doc_index.py
+"""
+Document level of the two-level (document -> chunk) index.
+
+Each source file gets one vector: the normalized mean of its chunk
+embeddings, read back from the chunk collection after ingestion (no extra
+embedding pass), and the ids of its chunks ("chunk_ids", JSON string).
+Retrieval first picks the top documents here, then fetches just those chunks
+by id and ranks them locally, so the second stage never touches the full
+chunk HNSW index.
+"""
+import hashlib
+import json
+import logging
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src.ingestion.dedup import expand_citations
+
+logger = logging.getLogger(__name__)
+
+# Chroma .get() page size when reading chunk embeddings back
+_GET_BATCH = 512
+
+
+def _doc_id(source: str) -> str:
+    return hashlib.sha1(source.encode("utf-8")).hexdigest()
+
+
+def build_document_index(chunk_store: Any, doc_store: Any, ids: List[str], metadatas: List[dict]) -> int:
+    """
+    Upsert one vector per source document from the chunks just added
+    (`ids` / `metadatas` as passed to / returned by add_texts).
+    A chunk that stands for collapsed duplicates ("also_in") belongs to each
+    of their documents too. Returns the number of documents indexed.
+    """
+    by_source: Dict[str, List[str]] = defaultdict(list)
+    meta_by_source: Dict[str, dict] = {}
+    for cid, meta in zip(ids, metadatas):
+        for cite in expand_citations(meta):
+            src = cite.get("source", "")
+            if not src or (by_source[src] and by_source[src][-1] == cid):
+                continue
+            by_source[src].append(cid)
+            meta_by_source.setdefault(src, cite)
+
+    if not by_source:
+        return 0
+
+    vec_by_id: Dict[str, np.ndarray] = {}
+    for i in range(0, len(ids), _GET_BATCH):
+        got = chunk_store._collection.get(ids=ids[i:i + _GET_BATCH], include=["embeddings"])
+        for cid, emb in zip(got["ids"], got["embeddings"]):
+            vec_by_id[cid] = np.asarray(emb, dtype=np.float32)
+
+    doc_ids, doc_vecs, doc_metas, doc_texts = [], [], [], []
+    for src, cids in by_source.items():
+        vecs = [vec_by_id[c] for c in cids if c in vec_by_id]
+        if not vecs:
+            continue
+        v = np.mean(np.stack(vecs), axis=0)
+        v /= np.linalg.norm(v) + 1e-12
+        meta = meta_by_source[src]
+        doc_ids.append(_doc_id(src))
+        doc_vecs.append(v.tolist())
+        doc_metas.append({
+            "source": src,
+            "doc_title": meta.get("doc_title", ""),
+            "corpus": meta.get("corpus", "unknown"),
+            "n_chunks": len(vecs),
+            "chunk_ids": json.dumps([c for c in cids if c in vec_by_id]),
+        })
+        doc_texts.append(meta.get("doc_title", "") or src)
+
+    if doc_ids:
+        doc_store._collection.upsert(ids=doc_ids, embeddings=doc_vecs, metadatas=doc_metas, documents=doc_texts)
+    logger.info(f"Document index: upserted {len(doc_ids)} documents")
+    return len(doc_ids)
+
+
+def _chunk_ids(meta: Optional[dict]) -> List[str]:
+    try:
+        return json.loads((meta or {}).get("chunk_ids") or "[]")
+    except Exception:
+        return []
+
+
+def select_documents_batch(
+    doc_store: Any, query_vecs: List[List[float]], top_n: int, filter: Optional[Dict[str, Any]] = None
+) -> List[List[str]]:
+    """
+    One document-index query for many queries. Returns, per query, the chunk
+    ids of its top_n closest documents (empty when the index is empty).
+    """
+    coll = doc_store._collection
+    n = coll.count()
+    if n == 0 or not query_vecs:
+        return [[] for _ in query_vecs]
+    res = coll.query(
+        query_embeddings=query_vecs,
+        n_results=min(top_n, n),
+        where=filter or None,
+        include=["metadatas"],
+    )
+    out: List[List[str]] = []
+    for metas in res.get("metadatas") or [[] for _ in query_vecs]:
+        ids: List[str] = []
+        for m in metas:
+            ids.extend(_chunk_ids(m))
+        out.append(list(dict.fromkeys(ids)))
+    return out
+
+
+def select_documents(
+    doc_store: Any, query_vec: List[float], top_n: int, filter: Optional[Dict[str, Any]] = None
+) -> List[str]:
+    """Chunk ids of the top_n documents closest to the query (may be empty)."""
+    return select_documents_batch(doc_store, [query_vec], top_n, filter)[0]
+
+
+def fetch_chunks(
+    chunk_store: Any, ids: List[str], filter: Optional[Dict[str, Any]] = None
+) -> Dict[str, Tuple[str, dict, List[float]]]:
+    """id -> (text, metadata, embedding) for the given chunk ids that match `filter`."""
+    out: Dict[str, Tuple[str, dict, List[float]]] = {}
+    for i in range(0, len(ids), _GET_BATCH):
+        got = chunk_store._collection.get(
+            ids=ids[i:i + _GET_BATCH],
+            where=filter or None,
+            include=["documents", "metadatas", "embeddings"],
+        )
+        for cid, text, meta, emb in zip(got["ids"], got["documents"], got["metadatas"], got["embeddings"]):
+            out[cid] = (text, meta or {}, emb)
+    return out
+
+
+def backfill_document_index(chunk_store: Any, doc_store: Any) -> int:
+    """
+    Build the document index from an existing chunk collection when it is
+    empty, or was built before documents recorded their chunk ids.
+    """
+    if chunk_store._collection.count() == 0:
+        return 0
+    if doc_store._collection.count() > 0:
+        sample = doc_store._collection.get(limit=1, include=["metadatas"])
+        if all("chunk_ids" in (m or {}) for m in sample["metadatas"]):
+            return 0
+    got = chunk_store._collection.get(include=["metadatas"])
+    return build_document_index(chunk_store, doc_store, got["ids"], got["metadatas"])
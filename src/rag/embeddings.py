@@ -1,7 +1,14 @@
 # src/rag/embeddings.py
 import logging
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, InvalidStateError, TimeoutError as FutureTimeout
 from typing import Optional, Dict, Any, List
 
+from langchain_core.embeddings import Embeddings
+
 from src.config import Settings
 
 logger = logging.getLogger(__name__)
@@ -46,7 +53,148 @@ class _E5Embeddings(HuggingFaceEmbeddings):
         return super().embed_query(f"query: {text}", **kwargs)
 
 
-_cached_embeddings: Optional[HuggingFaceEmbeddings] = None
+def embed_queries(embeddings, texts: List[str]) -> List[List[float]]:
+    """
+    Embed many *queries* in one batched forward pass.
+    embed_documents batches, but for E5 it would add the 'passage:' prefix,
+    so queries get their 'query:' prefix here and skip the wrapper.
+    """
+    if isinstance(embeddings, MicroBatchedEmbeddings):
+        embeddings = embeddings.inner
+    if isinstance(embeddings, _E5Embeddings):
+        return HuggingFaceEmbeddings.embed_documents(embeddings, [f"query: {t}" for t in texts])
+    return embeddings.embed_documents(texts)
+
+
+class MicroBatchedEmbeddings(Embeddings):
+    """
+    Coalesce concurrent embed_query calls (from /chat threads, tools, router,
+    answer cache...) into one batched forward pass.
+
+    The first waiting query opens a window of `window_ms`; everything arriving
+    before it closes (up to `max_batch` queries) is embedded together and each
+    caller gets its own vector back. embed_documents is passed through.
+
+    A caller never waits more than `result_timeout` seconds on the batcher:
+    past that it embeds its query directly. A worker thread that died is
+    restarted on the next call.
+    """
+
+    def __init__(self, inner: Embeddings, window_ms: float = 3.0, max_batch: int = 32,
+                 result_timeout: float = 10.0):
+        self.inner = inner
+        self.window_s = max(0.0, window_ms) / 1000.0
+        self.max_batch = max(1, int(max_batch))
+        self.result_timeout = result_timeout
+        self._queue: "queue.Queue[tuple]" = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+
+        # Metrics
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._queries = 0
+        self._batch_sizes: Dict[int, int] = {}
+        self._delays_ms: deque = deque(maxlen=1000)  # recent queueing delays
+        self._max_delay_ms = 0.0
+        self._timeouts = 0
+        self._restarts = 0
+
+    def _ensure_worker(self) -> None:
+        worker = self._worker
+        if worker is not None and worker.is_alive():
+            return
+        with self._start_lock:
+            if self._worker is None or not self._worker.is_alive():
+                if self._worker is not None:
+                    logger.warning("Embedding micro-batcher worker died; restarting")
+                    with self._stats_lock:
+                        self._restarts += 1
+                self._worker = threading.Thread(target=self._run, name="embed-batcher", daemon=True)
+                self._worker.start()
+
+    def _collect(self) -> List[tuple]:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.window_s
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch: List[tuple] = []
+            try:
+                batch = self._collect()
+                # Skip callers that already gave up (timed out and cancelled)
+                live = [item for item in batch if item[1].set_running_or_notify_cancel()]
+                if not live:
+                    continue
+
+                started = time.monotonic()
+                vecs = embed_queries(self.inner, [text for text, _, _ in live])
+                if len(vecs) != len(live):
+                    raise RuntimeError(f"embedded {len(vecs)} vectors for {len(live)} queries")
+                for (_, fut, _), vec in zip(live, vecs):
+                    fut.set_result(vec)
+
+                with self._stats_lock:
+                    self._batches += 1
+                    self._queries += len(live)
+                    self._batch_sizes[len(live)] = self._batch_sizes.get(len(live), 0) + 1
+                    for _, _, enqueued in live:
+                        delay_ms = (started - enqueued) * 1000
+                        self._delays_ms.append(delay_ms)
+                        self._max_delay_ms = max(self._max_delay_ms, delay_ms)
+            except Exception as e:
+                logger.warning(f"Embedding micro-batch failed: {e}")
+                for _, fut, _ in batch:
+                    if not fut.done():
+                        try:
+                            fut.set_exception(e)
+                        except InvalidStateError:
+                            pass
+
+    def embed_query(self, text: str) -> List[float]:
+        self._ensure_worker()
+        fut: Future = Future()
+        self._queue.put((text, fut, time.monotonic()))
+        try:
+            return fut.result(timeout=self.result_timeout)
+        except FutureTimeout:
+            fut.cancel()  # the worker skips it if it has not started yet
+            with self._stats_lock:
+                self._timeouts += 1
+            logger.warning(f"Embedding micro-batcher gave no result in {self.result_timeout}s; embedding directly")
+            return embed_queries(self.inner, [text])[0]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.inner.embed_documents(texts)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            delays = sorted(self._delays_ms)
+            return {
+                "batches": self._batches,
+                "queries": self._queries,
+                "mean_batch_size": round(self._queries / self._batches, 2) if self._batches else 0.0,
+                "batch_sizes": dict(sorted(self._batch_sizes.items())),
+                "timeouts": self._timeouts,  # callers that fell back to a direct call
+                "worker_restarts": self._restarts,
+                "queue_delay_ms": {
+                    "p50": round(delays[len(delays) // 2], 2) if delays else 0.0,
+                    "p95": round(delays[int(0.95 * (len(delays) - 1))], 2) if delays else 0.0,
+                    "max": round(self._max_delay_ms, 2),
+                },
+            }
+
+
+_cached_embeddings: Optional[Embeddings] = None
 
 
 def get_embeddings(settings: Settings):
@@ -54,6 +202,7 @@ def get_embeddings(settings: Settings):
     Returns a singleton embeddings object.
     - If HF_MODEL contains 'e5', we use the _E5Embeddings wrapper.
     - Otherwise, we use vanilla HuggingFaceEmbeddings.
+    - With EMBED_BATCH_ENABLED, embed_query goes through MicroBatchedEmbeddings.
     """
     global _cached_embeddings
     if _cached_embeddings is not None:
@@ -64,11 +213,23 @@ def get_embeddings(settings: Settings):
 
     kwargs = _build_kwargs(model_name)
     if _is_e5(model_name):
-        _cached_embeddings = _E5Embeddings(**kwargs)
+        base = _E5Embeddings(**kwargs)
         logger.info("Initialized E5 wrapper embeddings")
     else:
-        _cached_embeddings = HuggingFaceEmbeddings(**kwargs)
+        base = HuggingFaceEmbeddings(**kwargs)
         logger.info("Initialized standard HF embeddings")
 
+    if settings.EMBED_BATCH_ENABLED:
+        _cached_embeddings = MicroBatchedEmbeddings(
+            base, settings.EMBED_BATCH_WINDOW_MS, settings.EMBED_BATCH_MAX_SIZE,
+            result_timeout=settings.EMBED_BATCH_TIMEOUT_S,
+        )
+        logger.info(
+            f"Query micro-batching on (window={settings.EMBED_BATCH_WINDOW_MS}ms, "
+            f"max_batch={settings.EMBED_BATCH_MAX_SIZE})"
+        )
+    else:
+        _cached_embeddings = base
+
     logger.info("Embeddings initialized successfully")
     return _cached_embeddings
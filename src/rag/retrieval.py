@@ -1,11 +1,186 @@
+import logging
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from langchain_chroma.vectorstores import maximal_marginal_relevance
+
 from src.config import Settings
+from src.rag.doc_index import (
+    backfill_document_index, fetch_chunks, select_documents, select_documents_batch,
+)
+
+logger = logging.getLogger(__name__)
+
+def mmr_fetch_k(k: int, settings: Settings) -> int:
+    return max(k * settings.MMR_FETCH_K_MULT, settings.MMR_FETCH_K_MIN)
+
+def _and_filter(*filters: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    parts = [f for f in filters if f]
+    if not parts:
+        return None
+    return parts[0] if len(parts) == 1 else {"$and": parts}
+
+def mmr_over_chunks(
+    query_vec: List[float],
+    chunks: List[tuple],
+    k: int,
+    fetch_k: int,
+    lambda_mult: float = 0.5,
+) -> List[Document]:
+    """
+    MMR over an already-fetched candidate set of (text, metadata, embedding):
+    keep the fetch_k most similar, then pick k with maximal_marginal_relevance
+    (same steps Chroma's MMR search runs after its ANN query).
+    """
+    if not chunks:
+        return []
+    q = np.asarray(query_vec, dtype=np.float32)
+    embs = np.asarray([c[2] for c in chunks], dtype=np.float32)
+    sims = (embs @ q) / (np.linalg.norm(embs, axis=1) * np.linalg.norm(q) + 1e-12)
+    top = np.argsort(-sims)[:fetch_k]
+    idxs = maximal_marginal_relevance(q, embs[top], k=k, lambda_mult=lambda_mult)
+    return [Document(page_content=chunks[top[j]][0], metadata=chunks[top[j]][1]) for j in idxs]
+
+class HierarchicalRetriever(BaseRetriever):
+    """
+    Two-level retrieval: pick the top documents from the document index, fetch
+    their chunks by id and run MMR over them locally. Falls back to flat MMR
+    when the document index has nothing for the query.
+    """
+
+    vectorstore: Any
+    doc_store: Any
+    k: int = 5
+    top_docs: int = 5
+    fetch_k_mult: int = 3
+    fetch_k_min: int = 8
+    lambda_mult: float = 0.5
+
+    def _get_relevant_documents(
+        self,
+        query: str,
+        *,
+        run_manager: CallbackManagerForRetrieverRun,
+        k: Optional[int] = None,
+        filter: Optional[Dict[str, Any]] = None,
+        **kwargs: Any,
+    ) -> List[Document]:
+        k = int(k or self.k)
+        fetch_k = max(k * self.fetch_k_mult, self.fetch_k_min)
+        vec = self.vectorstore.embeddings.embed_query(query)
+
+        try:
+            ids = select_documents(self.doc_store, vec, self.top_docs, filter)
+            chunks = list(fetch_chunks(self.vectorstore, ids, filter).values()) if ids else []
+        except Exception as e:
+            # e.g. document collection dropped by /reset: degrade to flat search
+            logger.warning(f"Document selection failed, using flat search: {e}")
+            chunks = []
+        if chunks:
+            return mmr_over_chunks(vec, chunks, k, fetch_k, self.lambda_mult)
+        return self.vectorstore.max_marginal_relevance_search_by_vector(
+            vec, k=k, fetch_k=fetch_k, lambda_mult=self.lambda_mult, filter=filter,
+        )
 
 def build_retriever(vectorstore, settings: Settings):
+    if settings.HIERARCHICAL_RETRIEVAL:
+        from src.rag.store import get_doc_store
+        doc_store = get_doc_store(settings, vectorstore.embeddings)
+        try:
+            backfill_document_index(vectorstore, doc_store)
+        except Exception as e:
+            logger.warning(f"Document index backfill failed: {e}")
+        return HierarchicalRetriever(
+            vectorstore=vectorstore,
+            doc_store=doc_store,
+            k=settings.DEFAULT_TOP_K,
+            top_docs=settings.HIER_TOP_DOCS,
+            fetch_k_mult=settings.MMR_FETCH_K_MULT,
+            fetch_k_min=settings.MMR_FETCH_K_MIN,
+            lambda_mult=settings.MMR_LAMBDA,
+        )
+
     retriever = vectorstore.as_retriever(
         search_type="mmr",
         search_kwargs={
             "k": settings.DEFAULT_TOP_K,
-            "fetch_k": max(settings.DEFAULT_TOP_K * 3, 8),
+            "fetch_k": mmr_fetch_k(settings.DEFAULT_TOP_K, settings),
+            "lambda_mult": settings.MMR_LAMBDA,
         },
     )
     return retriever
+
+def batch_mmr_search(
+    vectorstore,
+    query_vecs: List[List[float]],
+    k: int,
+    fetch_k: int,
+    lambda_mult: float = 0.5,
+    filter: Optional[Dict[str, str]] = None,
+) -> List[List[Document]]:
+    """
+    MMR search for many pre-embedded queries with a single Chroma query call.
+    Same result as max_marginal_relevance_search_by_vector per query.
+    """
+    if not query_vecs:
+        return []
+    res = vectorstore._collection.query(  # type: ignore[attr-defined]
+        query_embeddings=query_vecs,
+        n_results=fetch_k,
+        where=filter,
+        include=["documents", "metadatas", "embeddings"],
+    )
+    out: List[List[Document]] = []
+    for i, qv in enumerate(query_vecs):
+        texts = res["documents"][i] if res.get("documents") else []
+        if not texts:
+            out.append([])
+            continue
+        metas = res["metadatas"][i]
+        idxs = maximal_marginal_relevance(
+            np.array(qv, dtype=np.float32), res["embeddings"][i], k=k, lambda_mult=lambda_mult,
+        )
+        out.append([Document(page_content=texts[j], metadata=metas[j] or {}) for j in idxs])
+    return out
+
+def batch_hierarchical_search(
+    vectorstore,
+    doc_store,
+    query_vecs: List[List[float]],
+    k: int,
+    fetch_k: int,
+    lambda_mult: float = 0.5,
+    top_docs: int = 5,
+    filter: Optional[Dict[str, str]] = None,
+) -> List[List[Document]]:
+    """
+    Two-level search for many pre-embedded queries: one document-index query
+    for all of them, one chunk fetch for the union of selected chunks, then
+    local MMR per query. Queries with no selected documents use flat MMR.
+    """
+    if not query_vecs:
+        return []
+    try:
+        ids_per_query = select_documents_batch(doc_store, query_vecs, top_docs, filter)
+        wanted = list(dict.fromkeys(cid for ids in ids_per_query for cid in ids))
+        chunks = fetch_chunks(vectorstore, wanted, filter) if wanted else {}
+    except Exception as e:
+        logger.warning(f"Batch document selection failed, using flat search: {e}")
+        ids_per_query, chunks = [[] for _ in query_vecs], {}
+
+    out: List[List[Document]] = [[] for _ in query_vecs]
+    flat: List[int] = []
+    for i, (qv, ids) in enumerate(zip(query_vecs, ids_per_query)):
+        cands = [chunks[c] for c in ids if c in chunks]
+        if cands:
+            out[i] = mmr_over_chunks(qv, cands, k, fetch_k, lambda_mult)
+        else:
+            flat.append(i)
+    if flat:
+        results = batch_mmr_search(vectorstore, [query_vecs[i] for i in flat], k, fetch_k, lambda_mult, filter)
+        for i, docs in zip(flat, results):
+            out[i] = docs
+    return out
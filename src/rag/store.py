@@ -9,31 +9,38 @@ from chromadb.config import Settings as ChromaSettings
 logger = logging.getLogger(__name__)
 
 _vector_store_instance: Optional[Chroma] = None
+_doc_store_instance: Optional[Chroma] = None
+
+# Second level of the hierarchical index: one vector per source document
+DOC_COLLECTION = "hr_documents_docs"
 
 def _ensure_dir(path: str) -> None:
     os.makedirs(path, exist_ok=True)
 
+def create_vector_store(persist_dir: str, embeddings, collection_name: str = "hr_documents") -> Chroma:
+    """Open (or create) a Chroma collection at `persist_dir`. Not cached."""
+    _ensure_dir(persist_dir)
+
+    client_settings = ChromaSettings(
+        persist_directory=persist_dir,
+        anonymized_telemetry=False,
+        allow_reset=True,
+    )
+
+    return Chroma(
+        embedding_function=embeddings,
+        persist_directory=persist_dir,
+        client_settings=client_settings,
+        collection_name=collection_name,
+    )
+
 def get_vector_store(settings, embeddings) -> Chroma:
     global _vector_store_instance
 
     if _vector_store_instance is None:
         logger.info(f"Initializing vector store at: {settings.CHROMA_DIR}")
         try:
-            _ensure_dir(settings.CHROMA_DIR)
-
-            client_settings = ChromaSettings(
-                persist_directory=settings.CHROMA_DIR,
-                anonymized_telemetry=False,
-                allow_reset=True,
-            )
-
-            _vector_store_instance = Chroma(
-                embedding_function=embeddings,
-                persist_directory=settings.CHROMA_DIR,
-                client_settings=client_settings,
-                collection_name="hr_documents",
-            )
-
+            _vector_store_instance = create_vector_store(settings.CHROMA_DIR, embeddings)
             logger.info("Vector store initialized successfully")
         except Exception as e:
             logger.error(f"Error initializing vector store: {e}")
@@ -41,6 +48,14 @@ def get_vector_store(settings, embeddings) -> Chroma:
 
     return _vector_store_instance
 
+def get_doc_store(settings, embeddings) -> Chroma:
+    """Document-level collection (see src/rag/doc_index.py), next to the chunk collection."""
+    global _doc_store_instance
+
+    if _doc_store_instance is None:
+        _doc_store_instance = create_vector_store(settings.CHROMA_DIR, embeddings, DOC_COLLECTION)
+    return _doc_store_instance
+
 def initialize_vector_store(settings):
     from src.rag.embeddings import get_embeddings
     embeddings = get_embeddings(settings)
@@ -59,12 +74,17 @@ def get_vector_store_stats(vector_store: Chroma) -> dict:
         return {"total_documents": 0, "collection_name": "unknown"}
 
 def clear_vector_store(settings) -> bool:
-    global _vector_store_instance
+    global _vector_store_instance, _doc_store_instance
     try:
         vs = initialize_vector_store(settings)
         coll_name = vs._collection.name  # type: ignore[attr-defined]
         vs._client.delete_collection(name=coll_name)  # type: ignore[attr-defined]
+        try:
+            vs._client.delete_collection(name=DOC_COLLECTION)  # type: ignore[attr-defined]
+        except Exception:
+            pass  # no document index yet
         _vector_store_instance = None
+        _doc_store_instance = None
 
         if os.path.isdir(settings.CHROMA_DIR):
             shutil.rmtree(settings.CHROMA_DIR, ignore_errors=True)
@@ -0,0 +1,35 @@
+# tests/conftest.py
+import os
+import sys
+
+# Modules are imported as `src.*` / `tools.*` from the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import zlib
+
+import numpy as np
+import pytest
+
+
+class HashEmbeddings:
+    """Deterministic bag-of-words embeddings: texts sharing words are close."""
+
+    dim = 64
+
+    def _vec(self, text):
+        v = np.zeros(self.dim, dtype=np.float32)
+        for w in text.lower().split():
+            v[zlib.crc32(w.encode("utf-8")) % self.dim] += 1.0
+        v[0] += 0.01  # never the zero vector
+        return (v / np.linalg.norm(v)).tolist()
+
+    def embed_documents(self, texts):
+        return [self._vec(t) for t in texts]
+
+    def embed_query(self, text):
+        return self._vec(text)
+
+
+@pytest.fixture
+def hash_embeddings():
+    return HashEmbeddings()
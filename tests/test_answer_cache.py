@@ -0,0 +1,130 @@
+# tests/test_answer_cache.py
+import numpy as np
+import pytest
+
+from src.agent.router import IntentRouter, cache_tag
+from src.rag.answer_cache import AnswerCache, default_threshold
+
+
+class _StubEmbeddings:
+    """Fixed vectors per normalized query; unknown queries are orthogonal to all."""
+
+    def __init__(self, vectors):
+        self.vectors = vectors
+        self.calls = 0
+
+    def embed_query(self, text):
+        self.calls += 1
+        return self.vectors.get(text, [0.0, 0.0, 0.0, 1.0])
+
+
+_VECS = {
+    "annual leave days": [1.0, 0.0, 0.0, 0.0],
+    "how many annual leave days": [0.99, 0.14, 0.0, 0.0],  # cos ~0.99
+    "leave policy for managers": [0.8, 0.6, 0.0, 0.0],     # cos 0.8
+    "jisr login": [0.0, 0.0, 1.0, 0.0],
+}
+
+
+def _cite(source):
+    return [{"doc_title": source, "chunk": 0, "source": source, "corpus": "hr"}]
+
+
+def test_threshold_hit_and_miss():
+    cache = AnswerCache(_StubEmbeddings(_VECS), threshold=0.95)
+    cache.store("Annual leave days", "30 days", _cite("a.pdf"))
+
+    hit = cache.lookup("how many annual leave days")
+    assert hit == {"answer": "30 days", "citations": _cite("a.pdf")}
+    assert cache.lookup("leave policy for managers") is None
+    assert cache.stats() == {"entries": 1, "hits": 1, "misses": 1}
+
+
+def test_exact_match_skips_embedding():
+    emb = _StubEmbeddings(_VECS)
+    cache = AnswerCache(emb)
+    cache.store("annual leave days", "30 days", _cite("a.pdf"))
+    calls = emb.calls
+    assert cache.lookup("  ANNUAL leave   days ") is not None
+    assert emb.calls == calls
+
+
+def test_lru_eviction_keeps_recently_used():
+    cache = AnswerCache(_StubEmbeddings(_VECS), max_entries=2)
+    cache.store("annual leave days", "a", _cite("a.pdf"))
+    cache.store("jisr login", "b", _cite("b.pdf"))
+    cache.lookup("annual leave days")                   # refresh -> "jisr login" is now oldest
+    cache.store("leave policy for managers", "c", _cite("c.pdf"))
+
+    assert cache.lookup("jisr login") is None
+    assert cache.lookup("annual leave days")["answer"] == "a"
+    assert cache.lookup("leave policy for managers")["answer"] == "c"
+
+
+def test_invalidation_uses_retrieved_sources_not_only_citations():
+    cache = AnswerCache(_StubEmbeddings(_VECS))
+    # The model cited only a.pdf, but b.pdf was retrieved too
+    cache.store("annual leave days", "a", _cite("a.pdf"), sources=["a.pdf", "b.pdf"])
+    cache.store("jisr login", "b", _cite("c.pdf"), sources=["c.pdf"])
+
+    assert cache.invalidate_sources(["b.pdf"]) == 1
+    assert cache.lookup("annual leave days") is None
+    assert cache.lookup("jisr login") is not None
+
+
+def test_prune_missing_drops_entries_for_deleted_files(tmp_path):
+    kept = tmp_path / "kept.pdf"
+    kept.write_text("x")
+    cache = AnswerCache(_StubEmbeddings(_VECS))
+    cache.store("annual leave days", "a", [], sources=[str(kept)])
+    cache.store("jisr login", "b", [], sources=[str(tmp_path / "gone.pdf")])
+
+    assert cache.prune_missing() == 1
+    assert cache.lookup("annual leave days") is not None
+
+
+def test_persistence_roundtrip(tmp_path):
+    path = str(tmp_path / "cache" / "answers.json")
+    cache = AnswerCache(_StubEmbeddings(_VECS), path=path, save_delay=0)
+    cache.store("annual leave days", "30 days", _cite("a.pdf"), sources=["a.pdf", "b.pdf"])
+    cache.flush()
+
+    assert np.load(tmp_path / "cache" / "answers.npy").shape == (1, 4)
+    reloaded = AnswerCache(_StubEmbeddings(_VECS), path=path)
+    assert reloaded.lookup("how many annual leave days")["answer"] == "30 days"
+    assert reloaded.invalidate_sources(["b.pdf"]) == 1
+
+
+class _SameVector:
+    """Every query embeds identically: only the tag can tell questions apart."""
+
+    def embed_query(self, text):
+        return [1.0, 0.0, 0.0, 0.0]
+
+
+def _tag(question):
+    return cache_tag(question, IntentRouter().route(question).label)
+
+
+@pytest.mark.parametrize("stored, asked", [
+    ("كم عدد أيام الإجازة السنوية", "كم عدد أيام الإجازة المرضية"),
+    ("how many annual leave days", "how many sick leave days"),
+    ("ما هي سياسة العمل الإضافي", "ما هي سياسة العمل الإضافي للمدراء"),
+    ("ما هي سياسة الإجازة", "كيف أرفع طلب إجازة في جسر"),   # hr vs both
+])
+def test_near_miss_questions_miss(stored, asked):
+    cache = AnswerCache(_SameVector(), threshold=0.95)
+    cache.store(stored, "answer", _cite("a.pdf"), tag=_tag(stored))
+    assert cache.lookup(asked, tag=_tag(asked)) is None
+
+
+def test_paraphrase_with_same_tag_hits():
+    cache = AnswerCache(_SameVector(), threshold=0.95)
+    stored, asked = "كم عدد أيام الإجازة السنوية", "ما هو عدد أيام الإجازة السنوية؟"
+    cache.store(stored, "30 يوم", _cite("a.pdf"), tag=_tag(stored))
+    assert cache.lookup(asked, tag=_tag(asked))["answer"] == "30 يوم"
+
+
+def test_default_threshold_follows_model_family():
+    assert default_threshold("intfloat/multilingual-e5-base") > \
+        default_threshold("sentence-transformers/all-MiniLM-L12-v2")
@@ -0,0 +1,61 @@
+# tests/test_batch.py
+import threading
+import time
+
+from src.agent.batch import answer_batch
+from src.agent.router import HR, RouteDecision
+from src.config import Settings
+from src.rag.store import create_vector_store
+
+
+class _Router:
+    def route(self, text, query_vec=None):
+        return RouteDecision(HR)
+
+
+class _SlowAnswerer:
+    def __init__(self):
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def invoke(self, inputs):
+        with self.lock:
+            self.calls += 1
+        time.sleep(0.05)
+        return {"output": f"answer to {inputs['input']}"}
+
+
+def _store(tmp_path, embeddings):
+    vs = create_vector_store(str(tmp_path / "chroma"), embeddings, collection_name="batch_test")
+    vs.add_texts(
+        texts=["annual leave is thirty days", "overtime is paid at 150 percent"],
+        metadatas=[{"source": f"{n}.pdf", "doc_title": n, "chunk": 0, "corpus": "hr"}
+                   for n in ("leave", "overtime")],
+    )
+    return vs
+
+
+def test_batch_answers_every_question_with_capped_concurrency(tmp_path, hash_embeddings):
+    settings = Settings(BATCH_MAX_CONCURRENCY=2, HIERARCHICAL_RETRIEVAL=False)
+    questions = [f"annual leave question {i}" for i in range(4)]
+    items = list(answer_batch(
+        questions, vector_store=_store(tmp_path, hash_embeddings), embeddings=hash_embeddings,
+        settings=settings, router=_Router(), answerer=_SlowAnswerer(), concurrency=50,
+    ))
+    summary = items.pop()["summary"]
+    assert summary["concurrency"] == 2
+    assert sorted(i["index"] for i in items) == [0, 1, 2, 3]
+    assert all(i["answer"].startswith("answer to") for i in items)
+
+
+def test_closing_the_stream_cancels_pending_questions(tmp_path, hash_embeddings):
+    settings = Settings(HIERARCHICAL_RETRIEVAL=False)
+    answerer = _SlowAnswerer()
+    gen = answer_batch(
+        [f"annual leave question {i}" for i in range(40)],
+        vector_store=_store(tmp_path, hash_embeddings), embeddings=hash_embeddings,
+        settings=settings, router=_Router(), answerer=answerer, concurrency=2,
+    )
+    next(gen)
+    gen.close()  # what Flask does when the client disconnects
+    assert answerer.calls < 10
@@ -0,0 +1,78 @@
+# tests/test_dedup.py
+import json
+
+from src.ingestion.cleaning import PAGE_BREAK, clean_document
+from src.ingestion.dedup import collapse_near_duplicates, expand_citations, strip_boilerplate
+
+HEADER = "شركة المثال - دليل السياسات الداخلية"
+STEP = "- يجب تقديم الطلب مسبقا"
+
+
+def _page(n, body):
+    return "\n".join([HEADER, *body, f"صفحة {n} من 3"])
+
+
+def _doc(text, source="policy.pdf", corpus="hr"):
+    return {"text": text, "meta": {"source": source, "doc_title": source, "corpus": corpus}}
+
+
+def test_page_headers_and_footers_kept_once_per_document():
+    topics = ["الإجازات", "العمل الإضافي", "نهاية الخدمة"]
+    pages = [_page(i, [f"مقدمة عن {t}", f"تفاصيل {t} للموظفين", f"أمثلة على {t}"])
+             for i, t in enumerate(topics, start=1)]
+    [out], stats = strip_boilerplate([_doc(PAGE_BREAK.join(pages))])
+
+    assert out["text"].count(HEADER) == 1
+    assert out["text"].count("من 3") == 1             # page numbers differ only in digits
+    assert all(f"{w} {t}" in out["text"] for t in topics for w in ("مقدمة عن", "تفاصيل", "أمثلة على"))
+    assert PAGE_BREAK not in out["text"]
+    assert stats["boilerplate_lines_removed"] == 4
+
+
+def test_repeated_lines_inside_pages_are_kept():
+    body = ["طلب الإجازة السنوية:", STEP, "طلب إجازة الزواج:", STEP, "طلب الإجازة المرضية:", STEP, "نهاية"]
+    [out], _ = strip_boilerplate([_doc("\n".join(body))])
+    assert out["text"].count(STEP) == 3
+
+
+def test_clean_document_keeps_page_breaks():
+    cleaned = clean_document(_doc("الصفحة الأولى.\fالصفحة الثانية"))
+    assert cleaned["text"].split(PAGE_BREAK) == ["الصفحة الاولي.", "الصفحة الثانية"]
+
+
+def test_near_duplicates_collapse_within_corpus_only():
+    text = "يستحق الموظف إجازة سنوية مدتها ثلاثون يوما مدفوعة الأجر بعد إكمال سنة كاملة في الخدمة"
+    records = [
+        (text, {"source": "a.pdf", "doc_title": "a", "chunk": 0, "corpus": "hr"}),
+        (text + " .", {"source": "b.pdf", "doc_title": "b", "chunk": 4, "corpus": "hr"}),
+        (text, {"source": "c.pdf", "doc_title": "c", "chunk": 0, "corpus": "jisr"}),
+        ("موضوع مختلف تماما عن تسجيل الدخول إلى المنصة", {"source": "d.pdf", "chunk": 0, "corpus": "jisr"}),
+    ]
+    kept, stats = collapse_near_duplicates(records)
+
+    assert stats["duplicates_collapsed"] == 1
+    assert [m["source"] for _, m in kept] == ["a.pdf", "c.pdf", "d.pdf"]
+    assert json.loads(kept[0][1]["also_in"])[0]["source"] == "b.pdf"
+    assert [c["source"] for c in expand_citations(kept[0][1])] == ["a.pdf", "b.pdf"]
+
+
+def test_collapsed_chunk_stays_reachable_from_duplicate_document(tmp_path, hash_embeddings):
+    from src.rag.doc_index import build_document_index, select_documents
+    from src.rag.store import create_vector_store
+
+    shared = "annual leave is thirty paid days after one year of service"
+    records = [
+        (shared, {"source": "a.pdf", "doc_title": "a", "chunk": 0, "corpus": "hr"}),
+        (shared, {"source": "b.pdf", "doc_title": "b", "chunk": 0, "corpus": "hr"}),
+        ("overtime is paid at one and a half times", {"source": "b.pdf", "doc_title": "b", "chunk": 1, "corpus": "hr"}),
+    ]
+    kept, _ = collapse_near_duplicates(records)
+    chunk_store = create_vector_store(str(tmp_path), hash_embeddings, collection_name="chunks")
+    doc_store = create_vector_store(str(tmp_path), hash_embeddings, collection_name="docs")
+    ids = chunk_store.add_texts([t for t, _ in kept], [m for _, m in kept])
+    assert build_document_index(chunk_store, doc_store, ids, [m for _, m in kept]) == 2
+
+    got = doc_store._collection.get(where={"source": "b.pdf"}, include=["metadatas"])
+    assert got["metadatas"][0]["n_chunks"] == 2        # its own chunk + the collapsed copy
+    b_only = select_documents(doc_store, hash_embeddings.embed_query("overtime"), 1)
+    assert set(b_only) == set(ids)
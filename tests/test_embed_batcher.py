@@ -0,0 +1,90 @@
+# tests/test_embed_batcher.py
+import threading
+import time
+
+import pytest
+
+from src.rag.embeddings import MicroBatchedEmbeddings
+
+
+class _Inner:
+    """Vector = [len(text), first char code]; records every batch it embeds."""
+
+    def __init__(self, delay=0.0, fail_times=0):
+        self.delay = delay
+        self.fail_times = fail_times
+        self.batches = []
+
+    def embed_documents(self, texts):
+        if self.fail_times:
+            self.fail_times -= 1
+            raise RuntimeError("model crashed")
+        time.sleep(self.delay)
+        self.batches.append(list(texts))
+        return [[float(len(t)), float(ord(t[0]))] for t in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+def _concurrently(fn, args):
+    results = [None] * len(args)
+    start = threading.Barrier(len(args))
+
+    def run(i):
+        start.wait()
+        results[i] = fn(args[i])
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(len(args))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(timeout=10)
+    return results
+
+
+def test_concurrent_callers_get_their_own_vectors_in_shared_batches():
+    inner = _Inner(delay=0.01)
+    emb = MicroBatchedEmbeddings(inner, window_ms=50, max_batch=8)
+    texts = [chr(ord("a") + i) * (i + 1) for i in range(16)]
+
+    vecs = _concurrently(emb.embed_query, texts)
+
+    assert vecs == [[float(len(t)), float(ord(t[0]))] for t in texts]
+    stats = emb.stats()
+    assert stats["queries"] == 16
+    assert stats["batches"] == len(inner.batches) < 16
+    assert sum(size * n for size, n in stats["batch_sizes"].items()) == 16
+    assert max(stats["batch_sizes"]) <= 8
+    assert stats["mean_batch_size"] > 1
+    assert stats["queue_delay_ms"]["max"] >= stats["queue_delay_ms"]["p50"] >= 0
+
+
+def test_failed_batch_raises_to_callers_and_worker_keeps_serving():
+    emb = MicroBatchedEmbeddings(_Inner(fail_times=1), window_ms=1)
+    with pytest.raises(RuntimeError, match="model crashed"):
+        emb.embed_query("first")
+    assert emb.embed_query("second") == [6.0, float(ord("s"))]
+
+
+def test_dead_worker_is_restarted():
+    emb = MicroBatchedEmbeddings(_Inner(), window_ms=1)
+    assert emb.embed_query("x") == [1.0, float(ord("x"))]
+    emb._worker = threading.Thread(target=lambda: None)  # simulate a worker that exited
+    emb._worker.start()
+    emb._worker.join()
+
+    assert emb.embed_query("yy") == [2.0, float(ord("y"))]
+    assert emb.stats()["worker_restarts"] == 1
+
+
+def test_stuck_batcher_falls_back_to_direct_embedding():
+    inner = _Inner()
+    emb = MicroBatchedEmbeddings(inner, window_ms=1, result_timeout=0.2)
+    emb._worker = threading.Thread(target=time.sleep, args=(5,), daemon=True)  # alive, never serves
+    emb._worker.start()
+
+    t0 = time.monotonic()
+    assert emb.embed_query("abc") == [3.0, float(ord("a"))]
+    assert time.monotonic() - t0 < 2
+    assert emb.stats()["timeouts"] == 1
@@ -0,0 +1,119 @@
+# tests/test_hr_agent.py
+import json
+import threading
+import time
+
+import pytest
+from langchain_core.documents import Document
+
+from src.agent import resilience
+from src.agent.hr_agent import answer_or_fallback, build_hr_agent, extract_citations, retrieved_sources
+from src.agent.tools import format_fallback_answer
+from src.config import Settings
+from tools.loadtest.stub_llm import StubState, parse_latency, serve
+
+
+def _tool_output(*sources):
+    return json.dumps({"context": "...", "citations": [{"source": s, "chunk": 0} for s in sources]})
+
+
+def test_retrieved_sources_reads_every_tool_output():
+    result = {
+        "output": "answer",
+        "intermediate_steps": [
+            ("hr_search", _tool_output("a.pdf", "b.pdf")),
+            ("jisr_search", _tool_output("b.pdf", "c.pdf")),
+            ("hr_search", "not json"),
+        ],
+    }
+    assert retrieved_sources(result) == ["a.pdf", "b.pdf", "c.pdf"]
+    assert retrieved_sources({"output": "no tools"}) == []
+
+
+def test_extract_citations_strips_block():
+    text = 'الجواب\n<citations>{"items":[{"source":"a.pdf","chunk":1}]}</citations>'
+    answer, citations = extract_citations(text)
+    assert answer == "الجواب"
+    assert citations == [{"source": "a.pdf", "chunk": 1}]
+
+
+# ---- LLM failure -> retrieval-only fallback ----------------------------------
+_DOCS = [Document(page_content="الإجازة السنوية 30 يوماً",
+                  metadata={"doc_title": "leave", "chunk": 0, "source": "leave.pdf", "corpus": "hr"})]
+
+
+class _StubRetriever:
+    def get_relevant_documents(self, query, k=None, filter=None):
+        return list(_DOCS)
+
+
+def _serve_errors(monkeypatch, status):
+    """Stub Groq endpoint that answers every request with `status`."""
+    server = serve("127.0.0.1", 0, StubState(parse_latency("fixed:0"), 0.0, 1.0, status, "stub"))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setenv("GROQ_BASE_URL", f"http://127.0.0.1:{server.server_address[1]}")
+    monkeypatch.setenv("GROQ_API_KEY", "stub")
+    monkeypatch.setattr(resilience, "_llm_caller", None)  # fresh breaker per test
+    return server
+
+
+@pytest.fixture
+def failing_llm(monkeypatch):
+    server = _serve_errors(monkeypatch, 503)
+    yield
+    server.shutdown()
+
+
+@pytest.fixture
+def rejecting_llm(monkeypatch):
+    server = _serve_errors(monkeypatch, 400)  # e.g. Groq's tool_use_failed
+    yield
+    server.shutdown()
+
+
+def test_agent_executor_failure_serves_fallback(failing_llm):
+    settings = Settings(LLM_TIMEOUT_S=2, LLM_DEADLINE_S=5, LLM_MAX_RETRIES=1,
+                        LLM_BACKOFF_BASE_S=0.01, LLM_BREAKER_FAILURES=2)
+    executor = build_hr_agent(_StubRetriever(), settings)
+    breaker = resilience.get_llm_caller(settings).breaker
+
+    t0 = time.monotonic()
+    payload, result = answer_or_fallback(
+        executor, {"input": "كم عدد أيام الإجازة السنوية؟", "chat_history": []},
+        breaker, lambda: format_fallback_answer(_DOCS),
+    )
+    assert result is None
+    assert payload == format_fallback_answer(_DOCS)
+    assert breaker.snapshot()["state"] == "open"  # failures went through the breaker
+    assert time.monotonic() - t0 < 5
+
+    # Breaker open: no provider call at all
+    payload, result = answer_or_fallback(executor, {"input": "x", "chat_history": []},
+                                         breaker, lambda: {"answer": "fallback", "citations": []})
+    assert (payload, result) == ({"answer": "fallback", "citations": []}, None)
+
+
+def test_request_deadline_caps_all_llm_calls(failing_llm):
+    settings = Settings(LLM_TIMEOUT_S=2, LLM_DEADLINE_S=30, LLM_MAX_RETRIES=50,
+                        LLM_BACKOFF_BASE_S=0.05, LLM_BREAKER_FAILURES=1000)
+    executor = build_hr_agent(_StubRetriever(), settings)
+
+    t0 = time.monotonic()
+    with resilience.request_deadline(0.5):
+        with pytest.raises(resilience.LLMUnavailable):
+            executor.invoke({"input": "كم عدد أيام الإجازة السنوية؟", "chat_history": []})
+    assert time.monotonic() - t0 < 2
+
+
+def test_rejected_request_serves_fallback_without_tripping(rejecting_llm):
+    settings = Settings(LLM_TIMEOUT_S=2, LLM_DEADLINE_S=5, LLM_MAX_RETRIES=2, LLM_BREAKER_FAILURES=1)
+    executor = build_hr_agent(_StubRetriever(), settings)
+    breaker = resilience.get_llm_caller(settings).breaker
+
+    payload, result = answer_or_fallback(
+        executor, {"input": "كم عدد أيام الإجازة السنوية؟", "chat_history": []},
+        breaker, lambda: format_fallback_answer(_DOCS),
+    )
+    assert result is None
+    assert payload == format_fallback_answer(_DOCS)
+    assert breaker.snapshot() == {"state": "closed", "consecutive_failures": 0}
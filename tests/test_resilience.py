@@ -0,0 +1,145 @@
+# tests/test_resilience.py
+import threading
+import time
+
+import pytest
+
+from src.agent import resilience
+from src.agent.resilience import (
+    CircuitBreaker, CircuitOpenError, LLMRequestRejected, LLMUnavailable, ResilientCaller,
+)
+
+
+class _HTTPError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+def _raises(exc):
+    def fn():
+        raise exc
+    return fn
+
+
+def _sequenced(*behaviours):
+    """fn whose n-th call runs behaviours[n] (a callable)."""
+    lock = threading.Lock()
+    count = [0]
+
+    def fn():
+        with lock:
+            i = count[0]
+            count[0] += 1
+        return behaviours[i]()
+    return fn, count
+
+
+def _after(delay, value=None, exc=None):
+    def run():
+        time.sleep(delay)
+        if exc is not None:
+            raise exc
+        return value
+    return run
+
+
+def _half_open_breaker(failures=1):
+    breaker = CircuitBreaker(failure_threshold=failures, reset_timeout=0.01)
+    for _ in range(failures):
+        breaker.record_failure()
+    time.sleep(0.02)
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    return breaker
+
+
+# ---- CircuitBreaker ------------------------------------------------------------
+def test_half_open_admits_a_single_probe():
+    breaker = _half_open_breaker()
+    granted = []
+    threads = [threading.Thread(target=lambda: granted.append(breaker.allow())) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert granted.count(True) == 1
+    assert breaker.is_open()  # everyone else is rejected while the probe runs
+    breaker.record_success()
+    assert breaker.snapshot() == {"state": "closed", "consecutive_failures": 0}
+
+
+def test_failed_probe_reopens():
+    breaker = _half_open_breaker()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+
+
+# ---- ResilientCaller -----------------------------------------------------------
+def _caller(breaker=None, **kwargs):
+    kwargs.setdefault("backoff_base", 0.0)
+    return ResilientCaller(breaker or CircuitBreaker(failure_threshold=5), **kwargs)
+
+
+def test_client_error_is_not_retried_and_keeps_the_count():
+    breaker = CircuitBreaker(failure_threshold=5)
+    breaker.record_failure()
+    fn, count = _sequenced(*[_raises(_HTTPError(400))] * 4)
+
+    with pytest.raises(LLMRequestRejected):
+        _caller(breaker, max_retries=3).call(fn)
+    assert count[0] == 1
+    assert breaker.snapshot() == {"state": "closed", "consecutive_failures": 1}
+
+
+def test_client_error_on_probe_does_not_close_the_breaker():
+    breaker = _half_open_breaker(failures=2)
+
+    with pytest.raises(LLMRequestRejected):
+        _caller(breaker).call(_raises(_HTTPError(400)))
+    assert breaker.snapshot() == {"state": "half_open", "consecutive_failures": 2}
+    assert breaker.allow()  # the probe slot was released
+
+
+def test_unclassified_error_counts_as_failure():
+    breaker = CircuitBreaker(failure_threshold=1)
+
+    with pytest.raises(LLMUnavailable):
+        _caller(breaker).call(_raises(ValueError("bad payload")))
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        _caller(breaker).call(lambda: "never called")
+
+
+def test_hedge_first_success_wins():
+    fn, count = _sequenced(_after(1.0, "slow"), _after(0.0, "fast"))
+    t0 = time.monotonic()
+    assert _caller(hedge_after=0.05).call(fn) == "fast"
+    assert count[0] == 2
+    assert time.monotonic() - t0 < 0.5
+
+
+def test_hedge_failure_does_not_mask_pending_success():
+    fn, _ = _sequenced(_after(0.2, "ok"), _after(0.0, exc=_HTTPError(503)))
+    breaker = CircuitBreaker(failure_threshold=1)
+    assert _caller(breaker, hedge_after=0.05).call(fn) == "ok"
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_backoff_jitter_stays_within_bounds(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(resilience.time, "sleep", sleeps.append)
+    caller = _caller(CircuitBreaker(failure_threshold=1000), max_retries=4,
+                     backoff_base=0.1, backoff_max=0.25, deadline=60)
+
+    for _ in range(50):
+        with pytest.raises(LLMUnavailable):
+            caller.call(_raises(TimeoutError()))
+
+    assert len(sleeps) == 50 * 4
+    bounds = [0.1, 0.2, 0.25, 0.25]  # base * 2**attempt, capped at backoff_max
+    for i, slept in enumerate(sleeps):
+        assert 0.0 <= slept <= bounds[i % 4]
+    assert max(sleeps) > 0.1  # actually jittered across the range, not pinned to 0
@@ -0,0 +1,75 @@
+# tests/test_retrieval.py
+import pytest
+
+from src.rag.doc_index import backfill_document_index, build_document_index, select_documents
+from src.rag.retrieval import HierarchicalRetriever, batch_hierarchical_search
+from src.rag.store import create_vector_store
+
+_CHUNKS = [
+    ("annual leave is thirty days per year", "leave.pdf", "hr"),
+    ("annual leave requests need manager approval", "leave.pdf", "hr"),
+    ("unused annual leave carries over", "leave.pdf", "hr"),
+    ("overtime is paid at one and a half times", "overtime.pdf", "hr"),
+    ("overtime needs prior approval", "overtime.pdf", "hr"),
+    ("log in to jisr with your work email", "jisr_login.pdf", "jisr"),
+]
+
+
+@pytest.fixture
+def stores(tmp_path, hash_embeddings):
+    chunk_store = create_vector_store(str(tmp_path), hash_embeddings, collection_name="chunks")
+    doc_store = create_vector_store(str(tmp_path), hash_embeddings, collection_name="docs")
+    metas = [{"source": src, "doc_title": src, "chunk": i, "corpus": corpus}
+             for i, (_, src, corpus) in enumerate(_CHUNKS)]
+    ids = chunk_store.add_texts(texts=[t for t, _, _ in _CHUNKS], metadatas=metas)
+    assert build_document_index(chunk_store, doc_store, ids, metas) == 3
+    return chunk_store, doc_store
+
+
+def _retriever(chunk_store, doc_store, **kw):
+    return HierarchicalRetriever(vectorstore=chunk_store, doc_store=doc_store, **dict(dict(k=2, top_docs=1), **kw))
+
+
+def test_second_stage_only_reads_selected_documents(stores, monkeypatch):
+    chunk_store, doc_store = stores
+
+    def no_ann(*a, **kw):
+        raise AssertionError("second stage must not query the full chunk index")
+
+    monkeypatch.setattr(chunk_store._collection, "query", no_ann)
+    docs = _retriever(chunk_store, doc_store).invoke("annual leave days")
+    assert len(docs) == 2
+    assert {d.metadata["source"] for d in docs} == {"leave.pdf"}
+
+
+def test_corpus_filter_applies_to_both_levels(stores):
+    chunk_store, doc_store = stores
+    docs = _retriever(chunk_store, doc_store, top_docs=3).invoke("approval", filter={"corpus": "jisr"})
+    assert {d.metadata["corpus"] for d in docs} == {"jisr"}
+
+
+def test_batch_matches_single_query_retrieval(stores, hash_embeddings):
+    chunk_store, doc_store = stores
+    queries = ["annual leave days", "overtime approval"]
+    batched = batch_hierarchical_search(
+        chunk_store, doc_store, [hash_embeddings.embed_query(q) for q in queries],
+        k=2, fetch_k=8, top_docs=1, filter={"corpus": "hr"},
+    )
+    single = [_retriever(chunk_store, doc_store).invoke(q, filter={"corpus": "hr"}) for q in queries]
+    assert [[d.page_content for d in docs] for docs in batched] == \
+        [[d.page_content for d in docs] for docs in single]
+
+
+def test_backfill_rebuilds_index_without_chunk_ids(stores, hash_embeddings):
+    chunk_store, doc_store = stores
+    # Index as written before documents recorded their chunk ids
+    got = doc_store._collection.get(include=["metadatas", "embeddings", "documents"])
+    stale = [{k: v for k, v in m.items() if k != "chunk_ids"} for m in got["metadatas"]]
+    doc_store._collection.delete(ids=got["ids"])
+    doc_store._collection.add(ids=got["ids"], embeddings=got["embeddings"], metadatas=stale,
+                              documents=got["documents"])
+    assert select_documents(doc_store, hash_embeddings.embed_query("annual leave"), 1) == []
+
+    assert backfill_document_index(chunk_store, doc_store) == 3
+    assert len(select_documents(doc_store, hash_embeddings.embed_query("annual leave"), 1)) == 3
+    assert backfill_document_index(chunk_store, doc_store) == 0
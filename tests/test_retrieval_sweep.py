@@ -0,0 +1,51 @@
+# tests/test_retrieval_sweep.py
+import pytest
+
+from tools.retrieval_sweep import evaluate, index_records, pick_cheapest
+
+_RECORDS = [
+    ("annual leave is thirty days per year", "leave.pdf", "hr"),
+    ("annual leave requests need manager approval", "leave.pdf", "hr"),
+    ("overtime is paid at one and a half times", "overtime.pdf", "hr"),
+    ("overtime needs prior approval", "overtime.pdf", "hr"),
+    ("log in to jisr with your work email", "jisr_login.pdf", "jisr"),
+]
+
+_LABELS = [
+    {"question": "annual leave days", "doc_title": "leave.pdf", "corpus": "hr"},
+    {"question": "overtime pay", "doc_title": "overtime.pdf", "corpus": "hr"},
+    {"question": "log in to jisr", "doc_title": "jisr_login.pdf", "corpus": "jisr"},
+]
+
+
+@pytest.fixture
+def indexed(tmp_path, hash_embeddings):
+    records = [(t, {"source": src, "doc_title": src, "chunk": i, "corpus": corpus})
+               for i, (t, src, corpus) in enumerate(_RECORDS)]
+    vs, doc_vs, _ = index_records(records, hash_embeddings, str(tmp_path))
+    return vs, doc_vs, [hash_embeddings.embed_query(lb["question"]) for lb in _LABELS]
+
+
+def test_hierarchical_evaluation_uses_document_index(indexed, monkeypatch):
+    vs, doc_vs, vecs = indexed
+    assert doc_vs._collection.count() == 3
+
+    def no_ann(*a, **kw):
+        raise AssertionError("hierarchical sweep must not query the full chunk index")
+
+    monkeypatch.setattr(vs._collection, "query", no_ann)
+    scores = evaluate(vs, _LABELS, vecs, k=1, fetch_k=4, lambda_mult=0.5, chunk_level_ok=False,
+                      doc_store=doc_vs, top_docs=1)
+    assert scores["recall_at_k"] == 1.0
+
+
+def test_flat_evaluation_still_available(indexed):
+    vs, _, vecs = indexed
+    scores = evaluate(vs, _LABELS, vecs, k=1, fetch_k=4, lambda_mult=0.5, chunk_level_ok=False)
+    assert scores["recall_at_k"] == 1.0
+
+
+def test_pick_cheapest_prefers_fewer_documents():
+    base = {"recall_at_k": 1.0, "mrr": 1.0, "top_k": 3, "search_ms_p50": 1.0, "index_mb": 1.0, "ingest_s": 1.0}
+    rows = [dict(base, top_docs=5), dict(base, top_docs=3)]
+    assert pick_cheapest(rows, min_recall=0.9)["top_docs"] == 3
@@ -0,0 +1,115 @@
+# tests/test_router.py
+import numpy as np
+import pytest
+
+from src.agent.router import (
+    BOTH, EXEMPLARS, HR, JISR, OUT_OF_SCOPE, SMALLTALK, UNKNOWN, IntentRouter, default_thresholds,
+)
+
+
+@pytest.mark.parametrize("text, label", [
+    ("", SMALLTALK),
+    ("hi", SMALLTALK),
+    ("السلام عليكم", SMALLTALK),
+    ("thanks a lot", SMALLTALK),
+    ("شكرا جزيلا", SMALLTALK),
+    ("this is about annual leave", HR),          # "hi" inside "this" is not a greeting
+    ("مرحبا، كم عدد أيام الإجازة؟", HR),          # greeting + question -> the question wins
+    ("كيف أسجل الدخول في جسر", JISR),
+    ("كيف أرفع طلب إجازة في منصة جسر", BOTH),
+])
+def test_keyword_routes(text, label):
+    decision = IntentRouter().route(text)
+    assert decision.label == label
+    assert decision.method == "keywords"
+
+
+def test_keyword_only_router_is_unknown_without_hits():
+    assert IntentRouter().route("ما هو راتبي").label == UNKNOWN
+
+
+@pytest.mark.parametrize("text", [
+    "شكرا وماذا عن المدراء",
+    "thanks, what about managers?",
+])
+def test_smalltalk_with_content_is_not_smalltalk(text):
+    assert IntentRouter().route(text).label == UNKNOWN
+
+
+@pytest.mark.parametrize("text", [
+    "ما هي الأحزاب السياسية في فرنسا",   # "سياسية" (political) is not "سياسة" (policy)
+    "please leave me alone",
+])
+def test_stems_do_not_match_unrelated_words(text):
+    assert IntentRouter().route(text).label not in (HR, JISR, BOTH)
+
+
+def test_stems_still_match_with_proclitics():
+    assert IntentRouter().route("وبالسياسات الجديدة").label == HR
+
+
+# Label axes; every vector also carries a large shared component, mimicking
+# E5 where unrelated texts still have cosine similarity ~0.7+.
+_AXES = {SMALLTALK: 1, HR: 2, JISR: 3, OUT_OF_SCOPE: 4}
+
+
+def _vec(**weights):
+    v = np.zeros(5, dtype=np.float32)
+    v[0] = 2.0
+    for label, w in weights.items():
+        v[_AXES[label]] = w
+    return (v / np.linalg.norm(v)).tolist()
+
+
+class _StubEmbeddings:
+    def __init__(self, queries):
+        self.label_of = {t: lbl for lbl, items in EXEMPLARS.items() for t in items}
+        self.queries = queries
+
+    def embed_documents(self, texts):
+        return [self.queries[t] if t in self.queries else _vec(**{self.label_of[t]: 1.0}) for t in texts]
+
+    def embed_query(self, text):
+        return self.queries[text]
+
+
+@pytest.fixture
+def router():
+    pytest.importorskip("langchain_huggingface")  # router embeds exemplars via src.rag.embeddings
+    queries = {
+        "ما هو راتبي": _vec(**{OUT_OF_SCOPE: 0.5, HR: 0.45}),   # near-tie: must not be refused
+        "ما هي حالة الطقس في جدة": _vec(**{OUT_OF_SCOPE: 1.0}),
+        "ما هي إجراءات النقل بين الفروع": _vec(**{HR: 1.0}),
+        "ما هو الرصيد المتبقي": _vec(**{HR: 0.6, JISR: 0.6}),
+    }
+    return IntentRouter(_StubEmbeddings(queries), min_score=0.9, oos_margin=0.02)
+
+
+def test_out_of_scope_needs_margin_over_domains(router):
+    decision = router.route("ما هو راتبي")
+    assert decision.label == UNKNOWN
+    assert decision.scores[OUT_OF_SCOPE] > decision.scores[HR]
+
+
+def test_clear_out_of_scope_is_refused(router):
+    assert router.route("ما هي حالة الطقس في جدة").label == OUT_OF_SCOPE
+
+
+def test_embedding_domain_and_both(router):
+    assert router.route("ما هي إجراءات النقل بين الفروع").label == HR
+    assert router.route("ما هو الرصيد المتبقي").label == BOTH
+
+
+def test_no_refusals_without_configured_margin(router):
+    router.oos_margin = None
+    assert router.route("ما هي حالة الطقس في جدة").label == UNKNOWN
+
+
+def test_precomputed_query_vec_skips_embedding(router):
+    vec = _vec(**{OUT_OF_SCOPE: 1.0})
+    assert router.route("unlisted text", query_vec=vec).label == OUT_OF_SCOPE
+
+
+def test_default_thresholds_follow_model_family():
+    assert default_thresholds("intfloat/multilingual-e5-base")["min_score"] > \
+        default_thresholds("sentence-transformers/all-MiniLM-L12-v2")["min_score"]
@@ -0,0 +1,42 @@
+# tests/test_run_load.py
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from tools.loadtest.run_load import run_load
+
+
+class _SlowChat(BaseHTTPRequestHandler):
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        time.sleep(0.3)
+        body = json.dumps({"answer": "ok", "citations": []}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def slow_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _SlowChat)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+
+
+def test_dropped_requests_count_as_errors(slow_server):
+    report = run_load(slow_server, [("سؤال", 1)], rps=20, concurrency=1, duration=0.5, seed=0)
+
+    assert report["scheduled"] == 10
+    assert report["dropped_at_concurrency_cap"] > 0
+    assert report["sent"] + report["dropped_at_concurrency_cap"] == report["scheduled"]
+    assert report["error_rate"] == pytest.approx(1 - report["success_rate"])
+    assert report["error_rate"] >= report["dropped_at_concurrency_cap"] / report["scheduled"]
@@ -0,0 +1,110 @@
+# tools/batch_answer.py
+"""
+Answer a file of questions in bulk (FAQ pages, regression checks after a
+policy update, onboarding packs) without going through /chat one by one.
+
+Runs in-process with the same vector store / router / LLM as the app, or
+against a running server with --url (POST /chat/batch).
+
+Usage:
+  python -m tools.batch_answer questions.txt --out answers.jsonl --concurrency 8
+  python -m tools.batch_answer questions.jsonl --url http://127.0.0.1:8000
+Input: .txt (one question per line) or .jsonl ({"question": ...}).
+"""
+import argparse
+import json
+import logging
+import sys
+import urllib.request
+from typing import Iterator, List, Optional
+
+from dotenv import load_dotenv
+
+logger = logging.getLogger("batch_answer")
+
+
+def read_questions(path: str) -> List[str]:
+    out: List[str] = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            out.append(json.loads(line)["question"] if path.endswith(".jsonl") else line)
+    return out
+
+
+def _remote(url: str, questions: List[str], top_k: Optional[int], concurrency: Optional[int]) -> Iterator[dict]:
+    body = {"questions": questions}
+    if top_k:
+        body["top_k"] = top_k
+    if concurrency:
+        body["concurrency"] = concurrency
+    req = urllib.request.Request(f"{url.rstrip('/')}/chat/batch",
+                                 data=json.dumps(body, ensure_ascii=False).encode("utf-8"),
+                                 headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(req) as resp:
+        for line in resp:
+            if line.strip():
+                yield json.loads(line)
+
+
+def _local(questions: List[str], top_k: Optional[int], concurrency: Optional[int]) -> Iterator[dict]:
+    from src.config import Settings
+    from src.agent.batch import answer_batch
+    from src.agent.hr_agent import build_routed_answerer
+    from src.agent.router import build_intent_router
+    from src.rag.embeddings import get_embeddings
+    from src.rag.retrieval import build_retriever
+    from src.rag.store import initialize_vector_store
+
+    settings = Settings()
+    vector_store = initialize_vector_store(settings)
+    retriever = build_retriever(vector_store, settings)
+    answerer = None
+    try:
+        answerer = build_routed_answerer(retriever, settings)
+    except Exception as e:
+        logger.warning(f"LLM unavailable, answers will be retrieval-only: {e}")
+
+    yield from answer_batch(
+        questions,
+        vector_store=vector_store,
+        embeddings=get_embeddings(settings),
+        doc_store=getattr(retriever, "doc_store", None),  # set when HIERARCHICAL_RETRIEVAL
+        settings=settings,
+        router=build_intent_router(settings) if settings.ROUTER_ENABLED else None,
+        answerer=answerer,
+        top_k=top_k,
+        concurrency=concurrency,
+    )
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description="Answer many HR/JISR questions at once (JSONL output)")
+    ap.add_argument("questions", help=".txt (one per line) or .jsonl with a 'question' field")
+    ap.add_argument("--out", default=None, help="output .jsonl (default: stdout)")
+    ap.add_argument("--url", default=None, help="use a running server's /chat/batch instead of in-process")
+    ap.add_argument("--top-k", type=int, default=None)
+    ap.add_argument("--concurrency", type=int, default=None)
+    args = ap.parse_args(argv)
+
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+
+    questions = read_questions(args.questions)
+    items = (_remote(args.url, questions, args.top_k, args.concurrency) if args.url
+             else _local(questions, args.top_k, args.concurrency))
+
+    out = open(args.out, "w", encoding="utf-8") if args.out else sys.stdout
+    try:
+        for item in items:
+            out.write(json.dumps(item, ensure_ascii=False) + "\n")
+            out.flush()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+# tools/loadtest/run_load.py
+"""
+Replay a mix of Arabic HR/JISR questions against /chat at a target RPS and
+concurrency, then report throughput, latency percentiles, error rate and the
+server process's CPU / memory usage.
+
+Open-loop scheduling: requests are released on a fixed 1/RPS clock and
+latency is measured from the scheduled start, so a slow server can't quietly
+lower the request rate. Requests that would exceed --concurrency are counted
+as dropped instead of delaying the clock; they count as failures in
+"error_rate" / "success_rate" (both over every scheduled request), but have no
+latency, so the percentiles cover answered requests only.
+
+Answers served from the semantic answer cache are counted separately
+("cache_hits", "latency_ms_uncached"); start the app with
+ANSWER_CACHE_ENABLED=0 to push every request through the LLM path.
+
+Usage (stub LLM + app running, see tools/loadtest/stub_llm.py):
+  python -m tools.loadtest.run_load --url http://127.0.0.1:8000 \
+      --rps 20 --concurrency 32 --duration 60 --server-pid $(pgrep -f "python app.py")
+(`python app.py` runs Flask's debug reloader: parent + serving child. Every
+PID given is sampled and CPU / RSS are summed.)
+"""
+import argparse
+import json
+import os
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+# (question, weight) — weights roughly follow real traffic: a few hot questions
+DEFAULT_QUESTIONS: List[Tuple[str, int]] = [
+    ("كم عدد أيام الإجازة السنوية؟", 10),
+    ("كيف تحسب مكافأة نهاية الخدمة؟", 8),
+    ("ما هي ساعات الدوام الرسمية؟", 5),
+    ("ما هي سياسة العمل الإضافي؟", 4),
+    ("ما هي مدة فترة التجربة؟", 3),
+    ("هل يوجد بدل سكن أو بدل نقل؟", 3),
+    ("ما هي إجراءات الاستقالة؟", 3),
+    ("كيف أرفع طلب إجازة في جسر؟", 8),
+    ("كيف أسجل الدخول إلى منصة جسر؟", 6),
+    ("كيف أشغل مسير الرواتب في جسر؟", 5),
+    ("كيف أضيف موظف جديد في جسر؟", 4),
+    ("نسيت كلمة المرور في جسر، ماذا أفعل؟", 3),
+    ("ما هي سياسة الإجازة المرضية وكيف أطلبها عبر جسر؟", 4),
+    ("مرحبا", 2),
+]
+
+
+def load_questions(path: Optional[str]) -> List[Tuple[str, int]]:
+    """Read questions from .txt (one per line) or .jsonl ({"question", "weight"})."""
+    if not path:
+        return DEFAULT_QUESTIONS
+    out: List[Tuple[str, int]] = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if path.endswith(".jsonl"):
+                item = json.loads(line)
+                out.append((item["question"], int(item.get("weight", 1))))
+            else:
+                out.append((line, 1))
+    return out
+
+
+def percentile(sorted_vals: List[float], p: float) -> float:
+    if not sorted_vals:
+        return 0.0
+    idx = min(len(sorted_vals) - 1, max(0, int(round(p / 100.0 * (len(sorted_vals) - 1)))))
+    return sorted_vals[idx]
+
+
+# ---- Server resource sampling (Linux /proc; psutil when available) -----------
+try:
+    import psutil  # type: ignore
+except Exception:  # pragma: no cover
+    psutil = None
+
+
+class ResourceSampler(threading.Thread):
+    """Samples CPU% and RSS (summed over `pids`) every `interval` seconds."""
+
+    def __init__(self, pids: List[int], interval: float = 0.5):
+        super().__init__(daemon=True)
+        self.pids = list(pids)
+        self.interval = interval
+        self.samples: List[Tuple[float, float]] = []  # (cpu_percent, rss_mb)
+        self._halt = threading.Event()
+        self._ticks = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+    def _proc_cpu_rss(self) -> Tuple[float, float]:
+        cpu_s = rss_mb = 0.0
+        for pid in self.pids:
+            with open(f"/proc/{pid}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+            cpu_s += (int(fields[11]) + int(fields[12])) / self._ticks  # utime + stime
+            rss_mb += int(fields[21]) * os.sysconf("SC_PAGE_SIZE") / 1e6
+        return cpu_s, rss_mb
+
+    def run(self):
+        procs = [psutil.Process(pid) for pid in self.pids] if psutil is not None else None
+        if procs is not None:
+            for p in procs:
+                p.cpu_percent(None)
+        else:
+            last_cpu, _ = self._proc_cpu_rss()
+            last_t = time.monotonic()
+        while not self._halt.wait(self.interval):
+            try:
+                if procs is not None:
+                    self.samples.append((
+                        sum(p.cpu_percent(None) for p in procs),
+                        sum(p.memory_info().rss for p in procs) / 1e6,
+                    ))
+                else:
+                    cpu, rss = self._proc_cpu_rss()
+                    now = time.monotonic()
+                    self.samples.append((100.0 * (cpu - last_cpu) / (now - last_t), rss))
+                    last_cpu, last_t = cpu, now
+            except Exception:
+                break
+
+    def stop(self) -> Dict[str, float]:
+        self._halt.set()
+        self.join(timeout=2)
+        if not self.samples:
+            return {}
+        cpus = [s[0] for s in self.samples]
+        rss = [s[1] for s in self.samples]
+        return {
+            "cpu_percent_avg": round(sum(cpus) / len(cpus), 1),
+            "cpu_percent_max": round(max(cpus), 1),
+            "rss_mb_avg": round(sum(rss) / len(rss), 1),
+            "rss_mb_max": round(max(rss), 1),
+        }
+
+
+# ---- Driver -------------------------------------------------------------------
+def _post_chat(url: str, question: str, session_id: str, timeout: float) -> Tuple[bool, str, bool]:
+    """Return (ok, error kind, served from the answer cache)."""
+    body = json.dumps({"message": question, "session_id": session_id}).encode("utf-8")
+    req = urllib.request.Request(f"{url.rstrip('/')}/chat", data=body,
+                                 headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            data = json.loads(resp.read() or b"{}")
+            if "error" in data:
+                return False, "app_error", False
+            return True, "", bool(data.get("cached"))
+    except urllib.error.HTTPError as e:
+        return False, f"http_{e.code}", False
+    except Exception as e:
+        return False, type(e).__name__, False
+
+
+def _latency_summary(lat: List[float]) -> Dict[str, float]:
+    """Percentiles of sorted latencies (seconds), in milliseconds."""
+    return {
+        "p50": round(percentile(lat, 50) * 1000, 1),
+        "p95": round(percentile(lat, 95) * 1000, 1),
+        "p99": round(percentile(lat, 99) * 1000, 1),
+        "max": round((lat[-1] if lat else 0.0) * 1000, 1),
+        "mean": round(sum(lat) / len(lat) * 1000, 1) if lat else 0.0,
+    }
+
+
+def run_load(url: str, questions: List[Tuple[str, int]], rps: float, concurrency: int,
+             duration: float, timeout: float = 60.0, session_mode: str = "unique",
+             server_pids: Optional[List[int]] = None, seed: Optional[int] = None) -> dict:
+    rng = random.Random(seed)
+    texts = [q for q, _ in questions]
+    weights = [w for _, w in questions]
+
+    lock = threading.Lock()
+    latencies: List[float] = []
+    uncached: List[float] = []  # latencies of answers not served from the cache
+    errors: Dict[str, int] = {}
+    slots = threading.Semaphore(concurrency)
+    dropped = 0
+
+    def one(question: str, scheduled: float):
+        try:
+            sid = uuid.uuid4().hex if session_mode == "unique" else "loadtest"
+            ok, err, cached = _post_chat(url, question, sid, timeout)
+            elapsed = time.perf_counter() - scheduled
+            with lock:
+                if ok:
+                    latencies.append(elapsed)
+                    if not cached:
+                        uncached.append(elapsed)
+                else:
+                    errors[err] = errors.get(err, 0) + 1
+        finally:
+            slots.release()
+
+    sampler = ResourceSampler(server_pids) if server_pids else None
+    if sampler:
+        sampler.start()
+
+    interval = 1.0 / rps
+    t0 = time.perf_counter()
+    n = 0
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        while True:
+            scheduled = t0 + n * interval
+            if scheduled - t0 >= duration:
+                break
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            # Concurrency cap reached: count as dropped rather than silently slowing the clock
+            if not slots.acquire(blocking=False):
+                dropped += 1
+                n += 1
+                continue
+            pool.submit(one, rng.choices(texts, weights)[0], scheduled)
+            n += 1
+    wall = time.perf_counter() - t0
+
+    resources = sampler.stop() if sampler else {}
+    lat = sorted(latencies)
+    unc = sorted(uncached)
+    sent = len(lat) + sum(errors.values())
+    failed = sum(errors.values()) + dropped
+    return {
+        "target_rps": rps,
+        "concurrency": concurrency,
+        "duration_s": round(wall, 2),
+        "scheduled": n,
+        "sent": sent,
+        "dropped_at_concurrency_cap": dropped,
+        "ok": len(lat),
+        "throughput_rps": round(len(lat) / wall, 2) if wall else 0.0,
+        # Over scheduled requests: an overloaded server must not look healthy
+        "success_rate": round(len(lat) / n, 4) if n else 0.0,
+        "error_rate": round(failed / n, 4) if n else 0.0,
+        "errors": errors,
+        "cache_hits": len(lat) - len(unc),
+        "latency_ms": _latency_summary(lat),  # answered requests only
+        "latency_ms_uncached": _latency_summary(unc),
+        "server": resources,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description="Load test /chat with a realistic Arabic HR/JISR mix")
+    ap.add_argument("--url", default="http://127.0.0.1:8000")
+    ap.add_argument("--rps", type=float, default=5.0)
+    ap.add_argument("--concurrency", type=int, default=16)
+    ap.add_argument("--duration", type=float, default=30.0, help="seconds")
+    ap.add_argument("--timeout", type=float, default=60.0, help="per-request timeout (seconds)")
+    ap.add_argument("--questions", default=None, help=".txt or .jsonl file; default built-in mix")
+    ap.add_argument("--session-mode", choices=["unique", "shared"], default="unique",
+                    help="unique = every request is a first turn; shared = one growing session")
+    ap.add_argument("--server-pid", type=int, nargs="+", default=None,
+                    help="app PID(s) for CPU/RSS sampling, summed (e.g. reloader parent + child)")
+    ap.add_argument("--seed", type=int, default=None)
+    ap.add_argument("--out", default=None, help="write the JSON report here as well")
+    args = ap.parse_args(argv)
+
+    report = run_load(
+        args.url, load_questions(args.questions), args.rps, args.concurrency, args.duration,
+        timeout=args.timeout, session_mode=args.session_mode,
+        server_pids=args.server_pid, seed=args.seed,
+    )
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    print(text)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+# tools/loadtest/stub_llm.py
+"""
+Local OpenAI/Groq-compatible stand-in for load tests (no Groq quota used).
+
+Serves POST .../chat/completions (the Groq SDK calls /openai/v1/chat/completions):
+  - request has tools and no tool results yet -> returns a tool call
+    (jisr_search when the question mentions JISR, hr_search otherwise)
+  - otherwise -> returns a short Arabic answer + <citations> block built from
+    the tool results it was given
+  - "stream": true -> Server-Sent Events chunks, ending with [DONE]
+
+Latency is sampled per request from a distribution spec:
+  fixed:0.8 | uniform:0.3,1.5 | normal:0.8,0.2 | lognormal:-0.3,0.5 | exp:0.8
+
+Usage:
+  python -m tools.loadtest.stub_llm --port 9100 --latency lognormal:-0.5,0.4
+  GROQ_BASE_URL=http://127.0.0.1:9100 GROQ_API_KEY=stub python app.py
+"""
+import argparse
+import json
+import logging
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger("stub_llm")
+
+_JISR_HINT = re.compile(r"جسر|jisr|منص|مسير", flags=re.I)
+
+
+def parse_latency(spec: str) -> Callable[[], float]:
+    """Turn 'kind:a,b' into a sampler returning seconds (never negative)."""
+    kind, _, args = (spec or "fixed:0").partition(":")
+    vals = [float(x) for x in args.split(",") if x.strip()] or [0.0]
+    kind = kind.strip().lower()
+    if kind == "fixed":
+        fn = lambda: vals[0]
+    elif kind == "uniform":
+        fn = lambda: random.uniform(vals[0], vals[1])
+    elif kind == "normal":
+        fn = lambda: random.gauss(vals[0], vals[1])
+    elif kind == "lognormal":
+        fn = lambda: random.lognormvariate(vals[0], vals[1])
+    elif kind == "exp":
+        fn = lambda: random.expovariate(1.0 / vals[0]) if vals[0] > 0 else 0.0
+    else:
+        raise ValueError(f"Unknown latency distribution: {spec}")
+    return lambda: max(0.0, fn())
+
+
+def _text(content: Any) -> str:
+    if isinstance(content, list):
+        return " ".join(p.get("text", "") for p in content if isinstance(p, dict))
+    return content or ""
+
+
+def _last_user(messages: List[dict]) -> str:
+    for m in reversed(messages):
+        if m.get("role") == "user":
+            return _text(m.get("content"))
+    return ""
+
+
+def _tool_citations(messages: List[dict]) -> List[dict]:
+    """Collect citations from tool results (JSON payloads from src/agent/tools._pack)."""
+    items: List[dict] = []
+    for m in messages:
+        body = _text(m.get("content"))
+        if m.get("role") == "tool" or '"citations"' in body:
+            for match in re.finditer(r"\{\"context\".*?\"citations\": \[.*?\]\}", body, flags=re.S):
+                try:
+                    items.extend(json.loads(match.group(0)).get("citations", []))
+                except Exception:
+                    pass
+    return items
+
+
+def build_reply(req: dict) -> Dict[str, Any]:
+    """Return {"content": str|None, "tool_calls": list|None} for a chat request."""
+    messages = req.get("messages") or []
+    tools = {t.get("function", {}).get("name") for t in (req.get("tools") or [])}
+    has_tool_results = any(m.get("role") == "tool" for m in messages)
+    question = _last_user(messages)
+
+    if tools and not has_tool_results:
+        name = "jisr_search" if _JISR_HINT.search(question) and "jisr_search" in tools else "hr_search"
+        if name not in tools:
+            name = sorted(t for t in tools if t)[0]
+        return {
+            "content": None,
+            "tool_calls": [{
+                "id": f"call_{uuid.uuid4().hex[:12]}",
+                "type": "function",
+                "function": {"name": name, "arguments": json.dumps({"query": question}, ensure_ascii=False)},
+            }],
+        }
+
+    cites = _tool_citations(messages)
+    refs = "\n".join(f"- {c.get('doc_title', '')} #{c.get('chunk', 0)}" for c in cites[:5])
+    content = (
+        f"إجابة تجريبية (خادم محلي) على: {question[:80]}\n\n"
+        f"المراجع:\n{refs or '-'}\n"
+        f"<citations>{json.dumps({'items': cites[:5]}, ensure_ascii=False)}</citations>"
+    )
+    return {"content": content, "tool_calls": None}
+
+
+class StubState:
+    def __init__(self, latency: Callable[[], float], token_delay: float,
+                 error_rate: float, error_status: int, model: str):
+        self.latency = latency
+        self.token_delay = token_delay
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.model = model
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+
+
+def make_handler(state: StubState):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, fmt, *args):  # keep load tests quiet
+            logger.debug(fmt % args)
+
+        def _json(self, status: int, body: dict) -> None:
+            data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path.rstrip("/").endswith("/models"):
+                return self._json(200, {"object": "list", "data": [{"id": state.model, "object": "model"}]})
+            if self.path == "/stats":
+                with state.lock:
+                    return self._json(200, {"requests": state.requests, "errors": state.errors})
+            self._json(404, {"error": {"message": "not found"}})
+
+        def do_POST(self):
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                return self._json(404, {"error": {"message": "not found"}})
+
+            length = int(self.headers.get("Content-Length") or 0)
+            try:
+                req = json.loads(self.rfile.read(length) or b"{}")
+            except Exception:
+                return self._json(400, {"error": {"message": "invalid JSON"}})
+
+            with state.lock:
+                state.requests += 1
+            time.sleep(state.latency())
+
+            if state.error_rate and random.random() < state.error_rate:
+                with state.lock:
+                    state.errors += 1
+                return self._json(state.error_status, {"error": {"message": "injected failure", "type": "stub"}})
+
+            reply = build_reply(req)
+            cid = f"chatcmpl-{uuid.uuid4().hex[:16]}"
+            created = int(time.time())
+            model = req.get("model") or state.model
+            finish = "tool_calls" if reply["tool_calls"] else "stop"
+            usage = {"prompt_tokens": 100, "completion_tokens": 50, "total_tokens": 150}
+
+            if req.get("stream"):
+                return self._stream(cid, created, model, reply, finish, usage)
+
+            message = {"role": "assistant", "content": reply["content"]}
+            if reply["tool_calls"]:
+                message["tool_calls"] = reply["tool_calls"]
+            self._json(200, {
+                "id": cid, "object": "chat.completion", "created": created, "model": model,
+                "choices": [{"index": 0, "message": message, "finish_reason": finish}],
+                "usage": usage,
+            })
+
+        def _stream(self, cid, created, model, reply, finish, usage):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            self.close_connection = True
+
+            def emit(delta: dict, finish_reason: Optional[str] = None, extra: Optional[dict] = None):
+                chunk = {
+                    "id": cid, "object": "chat.completion.chunk", "created": created, "model": model,
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+                }
+                if extra:
+                    chunk.update(extra)
+                self.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+
+            emit({"role": "assistant", "content": ""})
+            if reply["tool_calls"]:
+                calls = [dict(tc, index=i) for i, tc in enumerate(reply["tool_calls"])]
+                emit({"tool_calls": calls})
+            else:
+                words = reply["content"].split(" ")
+                for i, w in enumerate(words):
+                    emit({"content": w if i == 0 else " " + w})
+                    if state.token_delay:
+                        time.sleep(state.token_delay)
+            emit({}, finish, {"x_groq": {"usage": usage}})
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+
+    return Handler
+
+
+def serve(host: str, port: int, state: StubState) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer((host, port), make_handler(state))
+    server.daemon_threads = True
+    return server
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description="Local Groq/OpenAI-compatible stub for load tests")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=9100)
+    ap.add_argument("--latency", default="lognormal:-0.7,0.4",
+                    help="per-request latency distribution (seconds), e.g. fixed:0.5")
+    ap.add_argument("--token-delay", type=float, default=0.0,
+                    help="extra delay between streamed chunks (seconds)")
+    ap.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests that fail")
+    ap.add_argument("--error-status", type=int, default=503)
+    ap.add_argument("--model", default="openai/gpt-oss-120b")
+    ap.add_argument("--seed", type=int, default=None)
+    args = ap.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    if args.seed is not None:
+        random.seed(args.seed)
+
+    state = StubState(parse_latency(args.latency), args.token_delay,
+                      args.error_rate, args.error_status, args.model)
+    server = serve(args.host, args.port, state)
+    logger.info(f"Stub LLM listening on http://{args.host}:{args.port} (latency={args.latency})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,273 @@
+# tools/retrieval_sweep.py
+"""
+Offline retrieval quality / latency sweep over chunking and MMR parameters.
+
+For every (MAX_CHUNK_TOKENS, CHUNK_OVERLAP) pair the corpus is re-chunked
+(with the ingestion de-dup stage when DEDUP_ENABLED) and indexed into a
+temporary Chroma store together with its document index; every (top_k,
+fetch_k multiplier, MMR lambda[, HIER_TOP_DOCS]) combination is then evaluated
+against a labeled question set. Retrieval runs the way /chat does: two-level
+(batch_hierarchical_search) when HIERARCHICAL_RETRIEVAL is on, flat MMR
+otherwise; --retrieval picks one or both.
+
+Labels (.jsonl, one per line):
+  {"question": "...", "doc_title": "policy wow", "corpus": "hr",
+   "contains": "optional snippet that must appear in the chunk",
+   "chunk": 3}
+  - doc_title is required; a result is relevant when its doc_title matches
+  - "contains" makes relevance chunk-level, independent of chunking params
+  - "chunk" is only honored for the chunking the labels were made with
+    (the current MAX_CHUNK_TOKENS / CHUNK_OVERLAP settings)
+
+Usage:
+  python -m tools.retrieval_sweep --labels data/eval/labels.jsonl \
+      --chunk-tokens 400,800 --overlap 60,120 --top-k 3,5,8 \
+      --fetch-mult 2,3 --lambda 0.3,0.5,0.8 --top-docs 3,5,8 \
+      --min-recall 0.9 --out sweep.json
+"""
+import argparse
+import itertools
+import json
+import logging
+import os
+import shutil
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.config import Settings
+from src.ingestion.cleaning import clean_document, _normalize_arabic
+from src.ingestion.dedup import expand_citations
+from src.ingestion.ingest_pipeline import RAW_JISR, RAW_POLICIES, prepare_records
+from src.ingestion.loaders import load_documents
+from src.rag.doc_index import build_document_index
+from src.rag.embeddings import embed_queries, get_embeddings
+from src.rag.retrieval import batch_hierarchical_search
+from src.rag.store import create_vector_store
+
+logger = logging.getLogger("retrieval_sweep")
+
+
+def _floats(s: str) -> List[float]:
+    return [float(x) for x in s.split(",") if x.strip()]
+
+
+def _ints(s: str) -> List[int]:
+    return [int(x) for x in s.split(",") if x.strip()]
+
+
+def load_labels(path: str) -> List[dict]:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _dir_size_mb(path: str) -> float:
+    total = 0
+    for p in Path(path).rglob("*"):
+        if p.is_file():
+            total += p.stat().st_size
+    return total / 1e6
+
+
+def _is_relevant(meta: Dict[str, Any], text: str, label: dict, chunk_level_ok: bool) -> bool:
+    # A de-duplicated chunk also stands for every copy collapsed into it
+    cites = [c for c in expand_citations(meta) if str(c.get("doc_title", "")) == str(label["doc_title"])]
+    if not cites:
+        return False
+    snippet = label.get("contains")
+    if snippet and _normalize_arabic(snippet) not in (text or ""):
+        return False
+    if chunk_level_ok and label.get("chunk") is not None:
+        return any(int(c.get("chunk", -1)) == int(label["chunk"]) for c in cites)
+    return True
+
+
+def index_records(records: List[tuple], embeddings: Any, store_dir: str) -> Tuple[Any, Any, float]:
+    """Index chunks plus their document index in `store_dir`; returns (chunks, docs, seconds)."""
+    vs = create_vector_store(store_dir, embeddings, collection_name="sweep")
+    doc_vs = create_vector_store(store_dir, embeddings, collection_name="sweep_docs")
+    t0 = time.perf_counter()
+    metadatas = [r[1] for r in records]
+    ids = vs.add_texts(texts=[r[0] for r in records], metadatas=metadatas)
+    build_document_index(vs, doc_vs, ids, metadatas)
+    return vs, doc_vs, time.perf_counter() - t0
+
+
+def evaluate(vs, labels: List[dict], query_vecs: List[List[float]], k: int,
+             fetch_k: int, lambda_mult: float, chunk_level_ok: bool,
+             doc_store: Any = None, top_docs: Optional[int] = None) -> dict:
+    """
+    recall@k (fraction of questions with a relevant hit in top-k), MRR and
+    search latency. With a `doc_store` retrieval is two-level (top_docs
+    documents, then their chunks), as in HierarchicalRetriever; else flat MMR.
+    """
+    hits = 0
+    rr_sum = 0.0
+    lat_ms: List[float] = []
+    for label, vec in zip(labels, query_vecs):
+        flt = {"corpus": label["corpus"]} if label.get("corpus") else None
+        t0 = time.perf_counter()
+        if doc_store is not None:
+            docs = batch_hierarchical_search(
+                vs, doc_store, [vec], k=k, fetch_k=fetch_k, lambda_mult=lambda_mult,
+                top_docs=top_docs, filter=flt,
+            )[0]
+        else:
+            docs = vs.max_marginal_relevance_search_by_vector(
+                vec, k=k, fetch_k=fetch_k, lambda_mult=lambda_mult, filter=flt,
+            )
+        lat_ms.append((time.perf_counter() - t0) * 1000)
+        for rank, d in enumerate(docs, start=1):
+            if _is_relevant(d.metadata, d.page_content, label, chunk_level_ok):
+                hits += 1
+                rr_sum += 1.0 / rank
+                break
+
+    n = max(1, len(labels))
+    lat_sorted = sorted(lat_ms)
+    return {
+        "recall_at_k": round(hits / n, 4),
+        "mrr": round(rr_sum / n, 4),
+        "search_ms_p50": round(statistics.median(lat_sorted), 2) if lat_sorted else 0.0,
+        "search_ms_p95": round(lat_sorted[int(0.95 * (len(lat_sorted) - 1))], 2) if lat_sorted else 0.0,
+    }
+
+
+def run_sweep(settings: Settings, labels: List[dict], chunk_tokens: List[int], overlaps: List[int],
+              top_ks: List[int], fetch_mults: List[int], lambdas: List[float],
+              source: str = "all", workdir: Optional[str] = None,
+              top_docs: Optional[List[int]] = None, modes: Optional[List[str]] = None) -> dict:
+    embeddings = get_embeddings(settings)
+    modes = modes or ["hierarchical" if settings.HIERARCHICAL_RETRIEVAL else "flat"]
+    top_docs = top_docs or [settings.HIER_TOP_DOCS]
+    # (mode, top_docs) grid; flat search has no document stage
+    retrieval_grid = [(m, n) for m in modes for n in (top_docs if m == "hierarchical" else [None])]
+
+    # Load + clean once; only chunking changes between index configs
+    folders = []
+    if source in ("all", "policies"):
+        folders.append(RAW_POLICIES)
+    if source in ("all", "jisr"):
+        folders.append(RAW_JISR)
+    cleaned = [clean_document(d) for fld in folders for d in load_documents(fld)]
+
+    # Query embeddings are independent of the index: embed once, time once.
+    # One batched pass on the model itself (embed_queries bypasses the query
+    # micro-batcher, whose collection window would pad every single call).
+    questions = [lb["question"] for lb in labels]
+    t0 = time.perf_counter()
+    query_vecs = embed_queries(embeddings, questions) if questions else []
+    embed_ms = (time.perf_counter() - t0) * 1000 / max(1, len(questions))
+
+    root = workdir or tempfile.mkdtemp(prefix="retrieval_sweep_")
+    results: List[dict] = []
+    try:
+        for max_tokens, overlap in itertools.product(chunk_tokens, overlaps):
+            if overlap >= max_tokens:
+                continue
+            # Same de-dup stage as /ingest (DEDUP_ENABLED), so the index matches production
+            records, _, dedup_stats = prepare_records(cleaned, settings, max_tokens, overlap)
+            if not records:
+                logger.warning("No chunks produced; is data/raw populated?")
+                continue
+
+            store_dir = os.path.join(root, f"c{max_tokens}_o{overlap}")
+            vs, doc_vs, ingest_s = index_records(records, embeddings, store_dir)
+
+            index = {
+                "max_chunk_tokens": max_tokens,
+                "chunk_overlap": overlap,
+                "chunks": len(records),
+                "duplicates_collapsed": dedup_stats.get("duplicates_collapsed", 0),
+                "index_mb": round(_dir_size_mb(store_dir), 2),
+                "ingest_s": round(ingest_s, 2),
+            }
+            chunk_level_ok = (max_tokens == settings.MAX_CHUNK_TOKENS
+                              and overlap == settings.CHUNK_OVERLAP)
+            logger.info(f"Indexed {index}")
+
+            for (mode, n_docs), k, mult, lam in itertools.product(retrieval_grid, top_ks, fetch_mults, lambdas):
+                fetch_k = max(k * mult, settings.MMR_FETCH_K_MIN)
+                row = dict(index, retrieval=mode, top_docs=n_docs, top_k=k, fetch_k_mult=mult,
+                           fetch_k=fetch_k, mmr_lambda=lam, query_embed_ms=round(embed_ms, 2))
+                row.update(evaluate(vs, labels, query_vecs, k, fetch_k, lam, chunk_level_ok,
+                                    doc_store=doc_vs if mode == "hierarchical" else None,
+                                    top_docs=n_docs))
+                results.append(row)
+
+            for name in ("sweep", "sweep_docs"):
+                try:
+                    vs._client.delete_collection(name=name)  # type: ignore[attr-defined]
+                except Exception:
+                    pass
+    finally:
+        if workdir is None:
+            shutil.rmtree(root, ignore_errors=True)
+
+    return {"questions": len(labels), "results": results}
+
+
+def pick_cheapest(results: List[dict], min_recall: float, min_mrr: float = 0.0) -> Optional[dict]:
+    """
+    Cheapest config meeting the quality bar: fewest chunks returned, then
+    fewest documents searched, then latency, then index size.
+    """
+    ok = [r for r in results if r["recall_at_k"] >= min_recall and r["mrr"] >= min_mrr]
+    if not ok:
+        return None
+    return min(ok, key=lambda r: (r["top_k"], r.get("top_docs") or 0, r["search_ms_p50"],
+                                  r["index_mb"], r["ingest_s"]))
+
+
+def _print_table(results: List[dict]) -> None:
+    cols = ["max_chunk_tokens", "chunk_overlap", "retrieval", "top_docs", "top_k", "fetch_k", "mmr_lambda",
+            "recall_at_k", "mrr", "search_ms_p50", "chunks", "index_mb", "ingest_s"]
+    print("\t".join(cols))
+    for r in sorted(results, key=lambda r: (-r["recall_at_k"], -r["mrr"], r["search_ms_p50"])):
+        print("\t".join("-" if r[c] is None else str(r[c]) for c in cols))
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    settings = Settings()
+    ap = argparse.ArgumentParser(description="Sweep chunking + MMR parameters against a labeled set")
+    ap.add_argument("--labels", required=True, help=".jsonl with question/doc_title[/contains/chunk/corpus]")
+    ap.add_argument("--source", default="all", choices=["all", "policies", "jisr"])
+    ap.add_argument("--chunk-tokens", default=str(settings.MAX_CHUNK_TOKENS))
+    ap.add_argument("--overlap", default=str(settings.CHUNK_OVERLAP))
+    ap.add_argument("--top-k", default=str(settings.DEFAULT_TOP_K))
+    ap.add_argument("--fetch-mult", default=str(settings.MMR_FETCH_K_MULT))
+    ap.add_argument("--lambda", dest="lambdas", default=str(settings.MMR_LAMBDA))
+    ap.add_argument("--top-docs", default=str(settings.HIER_TOP_DOCS),
+                    help="HIER_TOP_DOCS values (hierarchical retrieval only)")
+    ap.add_argument("--retrieval", choices=["hierarchical", "flat", "both"],
+                    default="hierarchical" if settings.HIERARCHICAL_RETRIEVAL else "flat",
+                    help="default follows HIERARCHICAL_RETRIEVAL, like /chat")
+    ap.add_argument("--min-recall", type=float, default=0.9)
+    ap.add_argument("--min-mrr", type=float, default=0.0)
+    ap.add_argument("--workdir", default=None, help="keep temporary stores here (default: temp, deleted)")
+    ap.add_argument("--out", default=None, help="write full JSON results here")
+    args = ap.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+
+    report = run_sweep(
+        settings, load_labels(args.labels),
+        _ints(args.chunk_tokens), _ints(args.overlap), _ints(args.top_k),
+        _ints(args.fetch_mult), _floats(args.lambdas),
+        source=args.source, workdir=args.workdir, top_docs=_ints(args.top_docs),
+        modes=["hierarchical", "flat"] if args.retrieval == "both" else [args.retrieval],
+    )
+    report["best"] = pick_cheapest(report["results"], args.min_recall, args.min_mrr)
+
+    _print_table(report["results"])
+    print("\nCheapest config meeting the bar:",
+          json.dumps(report["best"], ensure_ascii=False) if report["best"] else "none")
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()